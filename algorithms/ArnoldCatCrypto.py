@@ -1,65 +1,281 @@
+import hashlib
 from .BaseCrypto import *
+from .LRUCache import LRUCache
 
 class ArnoldCatCrypto(BaseCrypto):
-    def __init__(self, key=None):
+    # 周期表：(a mod N, b mod N, N) -> 猫映射在 N×N 环面上的周期
+    __period_cache = {}
+    # 所有实例共享的置换索引缓存：(a, b, num_iter, 尺寸, reverse) -> 展平后的置换索引
+    index_cache = LRUCache(max_entries=32, max_bytes=512 * 1024 * 1024)
+    # 分块模式中为一个分块派生参数时最多尝试的次数，见 _derive_tile_key
+    TILE_KEY_ATTEMPTS = 8
+
+    def __init__(self, key=None, size=None, forward_decrypt=False, cache=None, mode='pad'):
+        """
+        key: 元组 (a, b, num_iter)
+        mode: 非方形图像的处理方式
+              'pad'    -> 补零到 max(h, w) 的方形后置乱（原有行为，输出为方形）
+              'native' -> 使用矩形猫映射在原尺寸上置乱，输出与输入尺寸相同
+        size: 可选，预期的图像边长 N；给定时在构造阶段拒绝弱密钥（num_iter 恰为周期的整数倍）
+        forward_decrypt: 解密时是否改用 period - num_iter 次正向变换
+        cache: 可选，自定义的置换索引缓存 (LRUCache)，默认使用类级共享缓存
+        """
         super().__init__(key)
+        self._set_key(key)
+        self.__forward_decrypt = forward_decrypt
+        assert mode in ('pad', 'native'), f"不支持的模式: {mode}"
+        self.__mode = mode
+        if cache is not None:
+            self.index_cache = cache
+        if size is not None:
+            assert not self.is_weak_key(key, size), \
+                f"弱密钥：num_iter={self.__num_iter} 是周期 {self.get_period(self.__a, self.__b, size)} 的整数倍，加密结果与原图相同"
+
+    @classmethod
+    def get_period(cls, a, b, N):
+        """计算（并缓存）猫映射在 N×N 图像上的周期，即满足 M^p ≡ I (mod N) 的最小正整数 p"""
+        cache_key = (a % N, b % N, N)
+        if cache_key not in cls.__period_cache:
+            identity = ((1 % N, 0), (0, 1 % N))
+            matrix = cls.__map_matrix(a, b, N)
+            current, period = matrix, 1
+            while current != identity:
+                current = cls.__matrix_mul(current, matrix, N)
+                period += 1
+            cls.__period_cache[cache_key] = period
+        return cls.__period_cache[cache_key]
+
+    @classmethod
+    def is_weak_key(cls, key, N):
+        """判断密钥在 N×N 图像上是否退化为恒等变换"""
+        a, b, num_iter = key
+        return num_iter % cls.get_period(a, b, N) == 0
+
+    def _set_key(self, key):
+        super()._set_key(key)
         self.__a, self.__b, self.__num_iter = key
 
-    def __transform(self, img, a, b, num_iter, reverse=False):
-        # 确保图像是方形的
+    def _derive_tile_key(self, key, index, shape):
+        """分块模式：第 index 个分块的 a、b 由 (a, b, index) 的哈希派生，各分块的参数对分块尺寸取模后不会成规律地重复
+
+        派生出的参数在该分块的网格上退化为恒等变换（如 2×2 分块周期为 3）时换用下一组；
+        TILE_KEY_ATTEMPTS 次均退化时 num_iter 是这些参数周期的整数倍，
+        改用其中单步不为恒等变换的一组并将 num_iter 加一。
+        """
+        a, b, num_iter = key
+        h, w = shape[:2]
+        candidates = []
+        for attempt in range(self.TILE_KEY_ATTEMPTS):
+            digest = hashlib.sha256(repr((a, b, index, attempt)).encode()).digest()
+            tile_a, tile_b = int.from_bytes(digest[:4], 'big'), int.from_bytes(digest[4:8], 'big')
+            if not self.__is_identity(tile_a, tile_b, num_iter, h, w):
+                return tile_a, tile_b, num_iter
+            candidates.append((tile_a, tile_b))
+        for tile_a, tile_b in candidates:
+            if not self.__is_identity(tile_a, tile_b, 1, h, w):
+                return tile_a, tile_b, num_iter + 1
+        # 单像素或单行 / 单列（'native' 模式）的分块上任何参数都是恒等变换
+        return candidates[0] + (num_iter,)
+
+    def __is_identity(self, a, b, num_iter, h, w):
+        """该参数在 h×w 图像（'pad' 模式下为补零后的方形）上的置乱是否为恒等变换"""
+        if h != w and self.__mode == 'native':
+            index, _ = self.__get_index(h, w, a, b, num_iter)
+            return bool(np.array_equal(index, np.arange(h * w)))
+        return self.is_weak_key((a, b, num_iter), max(h, w))
+
+    def __get_index(self, h, w, a, b, num_iter, reverse=False):
+        """获取（并缓存）h×w 图像对应的展平置换索引
+
+        Returns:
+            index: 展平后的置换索引
+            (gh, gw): 置换所作用的网格尺寸，'pad' 模式下非方形图像为补零后的方形
+        """
+        if h != w and self.__mode == 'native':
+            # 在 h×w 原尺寸上进行置乱，不做补零
+            index = self.index_cache.get_or_create(
+                ('rect', a, b, num_iter, h, w, reverse),
+                lambda: self.__rect_permutation_index(a, b, num_iter, h, w, reverse))
+            return index, (h, w)
+
+        N = max(h, w)  # 图像尺寸（非方形图像补零为方形）
+
+        # 映射具有周期性，迭代次数只需对周期取模
+        period = self.get_period(a, b, N)
+        num_iter %= period
+        if reverse and self.__forward_decrypt:
+            # 逆变换 num_iter 次等价于正向变换 period - num_iter 次
+            num_iter, reverse = (period - num_iter) % period, False
+
+        # 同一密钥、同一尺寸的图像共用一份置换索引，之后每帧只需一次 np.take
+        index = self.index_cache.get_or_create(
+            (a % N, b % N, num_iter, N, reverse),
+            lambda: self.__permutation_index(a, b, num_iter, N, reverse))
+        return index, (N, N)
+
+    def __transform(self, img, a, b, num_iter, reverse=False, measurement=NULL_MEASUREMENT):
         h, w = img.shape[:2]
-        if h != w:
-            size = max(h, w)
-            padded_img = np.zeros((size, size, 3) if len(img.shape) > 2 else (size, size),
-                                  dtype=img.dtype)
-            padded_img[:h, :w] = img
-            img = padded_img
-            h = w = size
-
-        # 创建结果数组
-        result = np.zeros_like(img)
-        N = h  # 图像尺寸
+        with measurement.phase('setup'):
+            index, (gh, gw) = self.__get_index(h, w, a, b, num_iter, reverse)
 
-        # 创建坐标矩阵
-        x, y = np.meshgrid(range(N), range(N))
+        with measurement.phase('permute'):
+            if (gh, gw) != (h, w):
+                # 确保图像是方形的
+                padded_img = np.zeros((gh, gw) + img.shape[2:], dtype=img.dtype)
+                padded_img[:h, :w] = img
+                img = padded_img
 
-        for _ in tqdm(range(num_iter)):
-            if not reverse:
-                # 正向变换
-                new_x = (x + b * y) % N
-                new_y = (a * x + (a * b + 1) * y) % N
-            else:
-                # 逆向变换
-                new_x = ((a * b + 1) * x - b * y) % N
-                new_y = (-a * x + y) % N
-
-            # 更新图像
-            if len(img.shape) == 3:
-                for i in range(3):
-                    result[:, :, i] = img[new_y, new_x, i]
+            flat = img.reshape(gh * gw, -1)
+            return np.take(flat, index, axis=0).reshape(img.shape)
+
+    def _container_params(self):
+        return {'mode': self.__mode}
+
+    def _prepare_batch(self, key, shape, decrypt):
+        """预先计算该尺寸的置换索引"""
+        a, b, num_iter = key
+        self.__get_index(shape[0], shape[1], a, b, num_iter, reverse=decrypt)
+
+    def _frame_processor(self, key, shape, decrypt):
+        """视频流：每帧一次 np.take / np.put，见 _plan_processor"""
+        process, cipher_shape = self._plan_processor(key, shape, None, decrypt)
+        out_shape = tuple(shape) if decrypt else cipher_shape
+        return lambda frame: process(frame, np.empty(out_shape, dtype=frame.dtype))
+
+    def _plan_processor(self, key, shape, dtype, decrypt):
+        """每次调用一次 np.take 直接写入 out（支持任意 dtype）；'pad' 模式下非方形图像直接在原尺寸与方形网格
+        之间收集 / 散射，不再补零，解密时也只处理原图范围内的像素"""
+        a, b, num_iter = key
+        h, w = shape[:2]
+        index, (gh, gw) = self.__get_index(h, w, a, b, num_iter, reverse=decrypt)
+        cipher_shape = (gh, gw) + tuple(shape[2:])
+        if (gh, gw) == (h, w):
+            # 预先转换为 intp，np.take 无需每次转换索引类型
+            index = index.astype(np.intp)
+
+            def process(img, out):
+                # 索引均有效，mode='clip' 避免默认的 mode='raise' 对 out 的额外缓冲
+                np.take(img.reshape(h * w, -1), index, axis=0, out=out.reshape(h * w, -1), mode='clip')
+                return out
+            return process, cipher_shape
+
+        # 逆变换的索引 reverse[i] 即原图第 i 个像素在密文中的位置，只保留原图范围内的部分
+        reverse, _ = self.__get_index(h, w, a, b, num_iter, reverse=True)
+        positions = reverse.reshape(gh, gw)[:h, :w].astype(np.intp).ravel()
+
+        def process(img, out):
+            if decrypt:
+                np.take(img.reshape(gh * gw, -1), positions, axis=0, out=out.reshape(h * w, -1), mode='clip')
             else:
-                result[:, :] = img[new_y, new_x]
+                out.fill(0)
+                # 以整个像素为元素散射（np.put），比按行的花式索引赋值快数倍
+                np.put(self.__pixel_view(out, gh * gw), positions, self.__pixel_view(img, h * w))
+            return out
+        return process, cipher_shape
+
+    @staticmethod
+    def __pixel_view(img, count):
+        """将连续的图像数组看作 count 个像素组成的一维数组，每个元素为一个像素的全部通道"""
+        flat = img.reshape(count, -1)
+        return flat.view(np.dtype((np.void, flat.shape[1] * flat.itemsize))).reshape(count)
+
+    @classmethod
+    def __permutation_index(cls, a, b, num_iter, N, reverse):
+        """生成展平后的置换索引：result.flat[i] = img.flat[index[i]]"""
+        # 猫映射是线性变换，迭代 num_iter 次等价于一次 M^num_iter (mod N) 的变换
+        matrix = cls.__map_matrix(a, b, N, reverse)
+        (m00, m01), (m10, m11) = cls.__matrix_power(matrix, num_iter, N)
+
+        # 创建坐标矩阵
+        x, y = np.meshgrid(np.arange(N, dtype=np.int64), np.arange(N, dtype=np.int64))
+        new_x = (m00 * x + m01 * y) % N
+        new_y = (m10 * x + m11 * y) % N
 
-            img = result.copy()
+        # 使用尽可能紧凑的整数类型保存索引
+        dtype = np.uint16 if N * N <= 1 << 16 else np.int32
+        return (new_y * N + new_x).astype(dtype).ravel()
 
+    @staticmethod
+    def __rect_permutation_index(a, b, num_iter, h, w, reverse):
+        """矩形猫映射的置换索引
+
+        猫映射矩阵可分解为两次错切：x' = x + b*y (mod w)，y' = y + a*x' (mod h)。
+        两次错切在任意 h×w 网格上都是双射，且 h == w 时与方形猫映射完全一致。
+        由于两个方向的模数不同，无法使用矩阵快速幂，改为对单步置换做快速幂。
+        """
+        x, y = np.meshgrid(np.arange(w, dtype=np.int64), np.arange(h, dtype=np.int64))
+        if not reverse:
+            # 正向变换
+            new_x = (x + b * y) % w
+            new_y = (y + a * new_x) % h
+        else:
+            # 逆向变换
+            new_y = (y - a * x) % h
+            new_x = (x - b * new_y) % w
+        step = (new_y * w + new_x).ravel()
+
+        # 置换的快速幂：index_{m+n} = index_m[index_n]
+        index = np.arange(h * w, dtype=np.int64)
+        while num_iter > 0:
+            if num_iter & 1:
+                index = index[step]
+            step = step[step]
+            num_iter >>= 1
+
+        dtype = np.uint16 if h * w <= 1 << 16 else np.int32
+        return index.astype(dtype)
+
+    @staticmethod
+    def __map_matrix(a, b, N, reverse=False):
+        """猫映射 (x, y) -> (x', y') 对应的变换矩阵 (mod N)"""
+        if not reverse:
+            # 正向变换
+            matrix = ((1, b), (a, a * b + 1))
+        else:
+            # 逆向变换
+            matrix = ((a * b + 1, -b), (-a, 1))
+        return tuple(tuple(v % N for v in row) for row in matrix)
+
+    @staticmethod
+    def __matrix_mul(p, q, N):
+        """2x2 矩阵乘法 (mod N)"""
+        return ((
+            (p[0][0] * q[0][0] + p[0][1] * q[1][0]) % N,
+            (p[0][0] * q[0][1] + p[0][1] * q[1][1]) % N,
+        ), (
+            (p[1][0] * q[0][0] + p[1][1] * q[1][0]) % N,
+            (p[1][0] * q[0][1] + p[1][1] * q[1][1]) % N,
+        ))
+
+    @classmethod
+    def __matrix_power(cls, matrix, n, N):
+        """快速幂计算 2x2 矩阵的 n 次幂 (mod N)"""
+        result = ((1 % N, 0), (0, 1 % N))
+        while n > 0:
+            if n & 1:
+                result = cls.__matrix_mul(result, matrix, N)
+            matrix = cls.__matrix_mul(matrix, matrix, N)
+            n >>= 1
         return result
 
     def encrypt(self, img):
-        time_start = time.time()
-        encrypted_image = self.__transform(img, self.__a, self.__b, self.__num_iter)
-        time_end = time.time()
-        print(f"Encryption time: {time_end - time_start:.2f}s")
-        return encrypted_image
-
-    def decrypt(self, img, key):
-        time_start = time.time()
-        a, b, num_iter = key
-        decrypted_image = self.__transform(img, a, b, num_iter, reverse=True)
-        time_end = time.time()
-        print(f"Encryption time: {time_end - time_start:.2f}s")
-        return decrypted_image
+        with self._measure('encrypt', img) as measurement:
+            return self.__transform(img, self.__a, self.__b, self.__num_iter, measurement=measurement)
+
+    def decrypt(self, img, key, shape=None):
+        """
+        shape: 可选，原图尺寸；'pad' 模式下加密结果被补零为方形，给定时裁剪回原尺寸
+        """
+        with self._measure('decrypt', img) as measurement:
+            a, b, num_iter = key
+            decrypted_image = self.__transform(img, a, b, num_iter, reverse=True, measurement=measurement)
+            if shape is not None:
+                decrypted_image = decrypted_image[:shape[0], :shape[1]]
+            return decrypted_image
 
 if __name__ == "__main__":
+    import cv2
+
     # 读取图像
     image, ext = "../assets/hust", ".jpg"
     img = cv2.imread(image + ext)
@@ -0,0 +1,97 @@
+import numpy as np
+
+from .LRUCache import LRUCache
+
+
+class ChaoticKeystream:
+    """Logistic 混沌密钥流生成器
+
+    x_{k+1} = r * x_k * (1 - x_k)，丢弃前 burn_in 个值后输出 int(x * scale)。
+    生成结果按 (r, x0, burn_in, scale) 缓存，并记录序列末尾的状态：
+    - 请求的长度不超过已缓存长度时，直接返回缓存序列的前缀视图；
+    - 请求更长的序列时，从末尾状态继续迭代，无需从头重新生成。
+    """
+
+    CHUNK_SIZE = 1 << 20  # 分块生成，限制临时 float64 缓冲区的大小
+
+    # 所有实例共享的密钥流缓存：(r, x0, burn_in, scale) -> (序列, 末尾状态 x)
+    cache = LRUCache(max_entries=16, max_bytes=256 * 1024 * 1024)
+
+    def __init__(self, r, x0, burn_in=200, scale=256, cache=None):
+        """
+        r: logistic参数，取值范围[3.57,4]
+        x0: 初始值，取值范围[0,1]
+        burn_in: 丢弃的瞬态值个数
+        scale: 量化系数，256 -> uint8 序列，2**32 -> uint32 序列
+        cache: 可选，自定义的 LRUCache，传入 False 表示不缓存
+        """
+        self.r, self.x0, self.burn_in, self.scale = r, x0, burn_in, scale
+        self.dtype = np.uint8 if scale <= 1 << 8 else np.uint32
+        if cache is not None:
+            self.cache = cache
+
+    @staticmethod
+    def logistic(x, r=4, steps=1):
+        """对单个状态迭代 steps 次 logistic 映射"""
+        for _ in range(steps):
+            x = r * x * (1 - x)
+        return x
+
+    @staticmethod
+    def escape(x, low=0.2, high=0.8, r=4, max_iters=None):
+        """反复迭代 logistic 映射，直到 x 落在 (low, high) 区间之外
+
+        该迭代次数取决于当前状态，只能逐个像素计算，无法批量生成。
+        max_iters: 最大迭代次数，None 表示不限制
+        x 落在区间内的不动点上（r=4 时为 0.75）时永远无法跳出，此时停在不动点上，
+        与 KeyMixingKernel 的处理相同
+        """
+        count = 0
+        while low < x < high and (max_iters is None or count < max_iters):
+            x_next = r * x * (1 - x)
+            if x_next == x:
+                break
+            x = x_next
+            count += 1
+        return x
+
+    def __fill(self, out, x):
+        """从状态 x 开始迭代，将量化结果写入预分配的 out，返回末尾状态"""
+        r = self.r
+
+        def states():
+            nonlocal x
+            while True:
+                x = r * x * (1 - x)
+                yield x
+
+        iterator = states()
+        for start in range(0, len(out), self.CHUNK_SIZE):
+            count = min(self.CHUNK_SIZE, len(out) - start)
+            block = np.fromiter(iterator, dtype=np.float64, count=count)
+            # x ∈ [0, 1]，int() 截断与 floor 一致；x 恰为 1.0 时按 dtype 位宽回绕，与 % 256 相同
+            out[start:start + count] = (np.floor(block * self.scale).astype(np.int64) % self.scale) \
+                .astype(self.dtype)
+        return x
+
+    def generate(self, length):
+        """生成长度为 length 的密钥流（只读数组，可能是缓存序列的前缀视图）"""
+        cache_key = (self.r, self.x0, self.burn_in, self.scale)
+        cached = self.cache.get(cache_key) if self.cache is not False else None
+
+        if cached is not None and len(cached[0]) >= length:
+            return cached[0][:length]
+
+        out = np.empty(length, dtype=self.dtype)
+        if cached is not None:
+            # 已有前缀，从末尾状态继续迭代
+            sequence, x = cached
+            out[:len(sequence)] = sequence
+            x = self.__fill(out[len(sequence):], x)
+        else:
+            x = self.__fill(out, self.logistic(self.x0, self.r, self.burn_in))
+
+        out.flags.writeable = False
+        if self.cache is not False:
+            self.cache.put(cache_key, (out, x))
+        return out
@@ -0,0 +1,174 @@
+"""自描述的加密容器文件
+
+文件布局（整数均为网络字节序）：
+
+    固定头  '!4sHHIQ'  magic b'IMGC', 版本, 标志位, 元数据长度, 密文体的偏移
+    元数据  UTF-8 JSON：算法名、算法参数、原图尺寸与类型、密钥指纹、密文布局
+    填充    补零使密文体按 ALIGNMENT 字节对齐
+    密文体  'array' 布局为原样的密文数组；'tiled' 布局为 BaseCrypto.encrypt_tiled 的输出
+
+密文体通过 np.memmap 按需读取：打开文件只解析文件头，'tiled' 布局下读取单个分块只会访问
+该分块的索引项与密文所在的页，无需载入整个文件，也不需要 PNG 编解码。
+"""
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+
+class CryptoContainer:
+    MAGIC = b'IMGC'
+    VERSION = 1
+    HEADER_FORMAT = '!4sHHIQ'
+    HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+    ALIGNMENT = 64
+    FLAG_TILED = 1
+
+    def __init__(self, path):
+        """打开容器文件，只读取文件头与元数据，密文体以 memmap 的方式按需访问"""
+        self.path = path
+        with open(path, 'rb') as file:
+            head = file.read(self.HEADER_SIZE)
+            if len(head) < self.HEADER_SIZE:
+                raise ValueError("文件长度不足，不是加密容器文件")
+            magic, version, flags, meta_length, body_offset = struct.unpack(self.HEADER_FORMAT, head)
+            if magic != self.MAGIC:
+                raise ValueError("不是加密容器文件")
+            if version > self.VERSION:
+                raise ValueError(f"不支持的容器版本: {version}")
+            self.meta = json.loads(file.read(meta_length).decode('utf-8'))
+        self.tiled = bool(flags & self.FLAG_TILED)
+        self.body = np.memmap(path, dtype=np.uint8, mode='r', offset=body_offset,
+                              shape=(self.meta['body_length'],))
+
+    @property
+    def algorithm(self):
+        return self.meta['algorithm']
+
+    @property
+    def shape(self):
+        """原图尺寸"""
+        return tuple(self.meta['shape'])
+
+    @staticmethod
+    def fingerprint(crypto, key, salt: bytes) -> str:
+        """密钥指纹：加盐的 SHA-256，只用于检查解密密钥是否与加密时一致
+
+        注意：ArnoldCat 等算法的密钥空间很小，指纹无法防止穷举，它并不比密文本身泄露更多信息。
+        """
+        return hashlib.sha256(salt + crypto._key_fingerprint_data(key)).hexdigest()
+
+    @classmethod
+    def write(cls, path, crypto, img: np.ndarray, tile_size=None, workers: int = 1):
+        """加密 img 并写入容器文件
+
+        tile_size: 给定时使用分块加密（见 BaseCrypto.encrypt_tiled），之后可以单独解密每个分块
+        Returns: 写入的字节数
+        """
+        img = np.asarray(img)
+        if tile_size is None:
+            body = crypto.encrypt(img)
+        else:
+            body = crypto.encrypt_tiled(img, tile_size, workers)
+        return cls.write_cipher(path, crypto, img.shape, img.dtype, body, tiled=tile_size is not None)
+
+    @classmethod
+    def write_cipher(cls, path, crypto, shape, dtype, body: np.ndarray, tiled: bool = False):
+        """将已经加密好的密文写入容器文件（加密与写文件分别在不同的进程/线程中进行时使用）
+
+        shape, dtype: 原图的尺寸与类型
+        body: crypto.encrypt 的结果，tiled 为 True 时为 crypto.encrypt_tiled 的结果
+        Returns: 写入的字节数
+        """
+        body = np.ascontiguousarray(body)
+        salt = os.urandom(16)
+        meta = {
+            'algorithm': type(crypto).__name__,
+            'params': crypto._container_params(),
+            'shape': list(shape),
+            'dtype': np.dtype(dtype).str,
+            'key_salt': salt.hex(),
+            'key_fingerprint': cls.fingerprint(crypto, crypto.key, salt),
+            'layout': 'tiled' if tiled else 'array',
+            'cipher_shape': list(body.shape),
+            'cipher_dtype': body.dtype.str,
+            'body_length': body.nbytes,
+        }
+        meta_bytes = json.dumps(meta, separators=(',', ':')).encode('utf-8')
+        body_offset = -(-(cls.HEADER_SIZE + len(meta_bytes)) // cls.ALIGNMENT) * cls.ALIGNMENT
+        flags = cls.FLAG_TILED if tiled else 0
+
+        with open(path, 'wb') as file:
+            file.write(struct.pack(cls.HEADER_FORMAT, cls.MAGIC, cls.VERSION, flags, len(meta_bytes), body_offset))
+            file.write(meta_bytes)
+            file.write(bytes(body_offset - cls.HEADER_SIZE - len(meta_bytes)))
+            file.write(memoryview(body).cast('B'))  # 直接写出密文数组的内存，不做额外拷贝
+        return body_offset + body.nbytes
+
+    def check(self, crypto, key):
+        """检查算法、参数与解密密钥是否与加密时一致，不一致时抛出 ValueError"""
+        if self.algorithm != type(crypto).__name__:
+            raise ValueError(f"容器由 {self.algorithm} 加密，不能使用 {type(crypto).__name__} 解密")
+        params = crypto._container_params()
+        if params != self.meta['params']:
+            raise ValueError(f"算法参数与加密时不一致: {params} != {self.meta['params']}")
+        if self.fingerprint(crypto, key, bytes.fromhex(self.meta['key_salt'])) != self.meta['key_fingerprint']:
+            raise ValueError("解密密钥与加密时使用的密钥不匹配")
+
+    def read_cipher(self) -> np.ndarray:
+        """'array' 布局的密文数组（只读的 memmap 视图，按需从文件读取）"""
+        assert not self.tiled, "分块布局请使用 read_tile"
+        return self.body.view(np.dtype(self.meta['cipher_dtype'])).reshape(self.meta['cipher_shape'])
+
+    def decrypt(self, crypto, key, workers: int = 1) -> np.ndarray:
+        """解密整幅图像，输出裁剪为原图尺寸"""
+        self.check(crypto, key)
+        if self.tiled:
+            result = crypto.decrypt_tiled(self.body, key, workers)
+        else:
+            result = crypto.decrypt(np.array(self.read_cipher()), key)
+        height, width = self.shape[:2]
+        return result[:height, :width].reshape(self.shape).astype(self.meta['dtype'], copy=False)
+
+    # ---- 'tiled' 布局：按分块读取 ----
+
+    def __tile_header(self):
+        from .BaseCrypto import BaseCrypto
+        header_size = struct.calcsize(BaseCrypto.TILE_HEADER_FORMAT)
+        return struct.unpack(BaseCrypto.TILE_HEADER_FORMAT, self.body[:header_size].tobytes()), header_size
+
+    @property
+    def num_tiles(self) -> int:
+        assert self.tiled, "容器不是分块布局"
+        return self.__tile_header()[0][6]
+
+    def tile_bounds(self, index: int):
+        """第 index 个分块在原图中的位置 (y, x, 高, 宽)"""
+        (_, height, width, _, th, tw, num_tiles), _ = self.__tile_header()
+        assert 0 <= index < num_tiles, f"分块序号超出范围: {index}"
+        cols = -(-width // tw)
+        y, x = (index // cols) * th, (index % cols) * tw
+        return y, x, min(th, height - y), min(tw, width - x)
+
+    def read_tile(self, index: int):
+        """读取第 index 个分块的密文，返回 (密文数组, 密文形状)，只访问该分块所在的文件区域"""
+        from .BaseCrypto import BaseCrypto
+        assert self.tiled, "容器不是分块布局"
+        (_, _, _, channels, _, _, num_tiles), header_size = self.__tile_header()
+        assert 0 <= index < num_tiles, f"分块序号超出范围: {index}"
+        entry_size = struct.calcsize(BaseCrypto.TILE_ENTRY_FORMAT)
+        start = header_size + index * entry_size
+        offset, length, ch, cw, cc = struct.unpack(BaseCrypto.TILE_ENTRY_FORMAT,
+                                                   self.body[start:start + entry_size].tobytes())
+        shape = (ch, cw) if cc == 1 and channels == 1 else (ch, cw, cc)
+        return self.body[offset:offset + length], shape
+
+    def decrypt_tile(self, crypto, key, index: int) -> np.ndarray:
+        """只解密第 index 个分块，返回该分块在原图中对应的区域（位置见 tile_bounds）"""
+        self.check(crypto, key)
+        cipher, shape = self.read_tile(index)
+        tile = crypto.decrypt(np.array(cipher).reshape(shape), crypto._derive_tile_key(key, index, shape))
+        _, _, h, w = self.tile_bounds(index)
+        return tile[:h, :w]
@@ -0,0 +1,56 @@
+"""预先构建的加解密计划
+
+BaseCrypto.prepare(shape, dtype) 在构建计划时完成与密钥和图像尺寸有关的全部计算（置换索引、密钥流、
+密钥调度表等）并分配中间缓冲区（见 BaseCrypto._plan_processor）；之后每次 encrypt / decrypt
+只做与像素数据有关的运算，结果写入调用方提供的 out 数组，稳态下不再分配新数组，
+逐帧处理时没有反复的内存分配与回收。
+
+计划持有可写的中间缓冲区，不能在多个线程中同时使用，多线程时每个线程各自 prepare 一个计划。
+"""
+import numpy as np
+
+
+class CryptoPlan:
+    def __init__(self, crypto, shape, dtype=np.uint8, key=None):
+        """
+        crypto: 算法实例，加密使用 crypto.key
+        shape: 明文图像的尺寸
+        dtype: 图像的数据类型
+        key: 解密密钥，默认为 crypto.key；解密所需的状态在第一次解密时构建，只加密时可以不给
+        """
+        self.crypto = crypto
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.key = crypto.key if key is None else key
+        self.__encrypt, cipher_shape = crypto._plan_processor(crypto.key, self.shape, self.dtype, False)
+        self.cipher_shape = tuple(cipher_shape)
+        self.__decrypt = None
+
+    def encrypt(self, img: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """加密 img（尺寸为 shape），结果写入 out（尺寸为 cipher_shape 的连续数组）并返回；
+        out 为 None 时分配新数组"""
+        self.__check_input(img, self.shape)
+        out = self.__check_output(out, self.cipher_shape)
+        with self.crypto._measure('encrypt', img):
+            return self.__encrypt(img, out)
+
+    def decrypt(self, img: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """解密 img（尺寸为 cipher_shape），结果写入 out（尺寸为 shape 的连续数组）并返回；
+        out 为 None 时分配新数组"""
+        self.__check_input(img, self.cipher_shape)
+        if self.__decrypt is None:
+            self.__decrypt, _ = self.crypto._plan_processor(self.key, self.shape, self.dtype, True)
+        out = self.__check_output(out, self.shape)
+        with self.crypto._measure('decrypt', img):
+            return self.__decrypt(img, out)
+
+    def __check_input(self, img, shape):
+        assert img.shape == shape and img.dtype == self.dtype, \
+            f"输入须为 {shape} 的 {self.dtype} 数组: {img.shape} {img.dtype}"
+
+    def __check_output(self, out, shape):
+        if out is None:
+            return np.empty(shape, dtype=self.dtype)
+        assert out.shape == shape and out.dtype == self.dtype and out.flags.c_contiguous, \
+            f"输出数组须为 {shape} 的连续 {self.dtype} 数组"
+        return out
@@ -0,0 +1,98 @@
+"""视频 / 帧流加解密
+
+与密钥和帧尺寸有关的状态（置换索引、密钥流等）只在每个流的第一帧到达时构建一次
+（见 BaseCrypto._frame_processor），之后每帧只做与像素数据有关的运算。
+
+每帧在加密前与一个掩码异或（解密时在最后异或），掩码由密钥、流随机数 nonce 与帧序号派生，
+使内容相同的帧（如静止画面）得到不同的密文。掩码由 numpy 的 PCG64 生成，只用于消除帧间的重复，
+不提供额外的密码学强度；生成 1080p 彩色帧的掩码约需 3ms。
+"""
+import hashlib
+import itertools
+import os
+from collections import deque
+
+import numpy as np
+
+
+class FrameStream:
+    NONCE_SIZE = 16
+
+    def __init__(self, crypto, frames, key, decrypt=False, nonce=None, shape=None, workers: int = 1,
+                 start: int = 0):
+        """
+        crypto: 算法实例
+        frames: 可迭代的帧序列（uint8 数组），或 cv2.VideoCapture 等具有 read() -> (ok, frame) 方法的对象
+        key: 加密时为 crypto.key，解密时为解密密钥
+        nonce: 流随机数。加密时默认随机生成，需与密文一同保存（self.nonce）；解密时必须给定
+        shape: 明文帧的尺寸，默认取第一帧的尺寸；解密 'pad' 模式下 ArnoldCat 的非方形帧时需要给定
+        workers: 同时处理的帧数，大于 1 时使用线程池（numpy 与 numba 内核在运算时释放 GIL），
+                 每帧最多在其后的 workers - 1 帧送入之后产出，延迟有界
+        start: 第一帧的序号，用于从流的中途开始解密
+        """
+        assert not (decrypt and nonce is None), "解密时必须给定加密时使用的 nonce"
+        assert workers >= 1, "workers 至少为 1"
+        self.crypto, self.key, self.decrypt = crypto, key, decrypt
+        self.nonce = os.urandom(self.NONCE_SIZE) if nonce is None else bytes(nonce)
+        self.shape = None if shape is None else tuple(shape)
+        self.workers, self.start = workers, start
+        self.__frames = frames
+        # 各帧掩码的种子：由密钥（加密密钥与解密密钥得到相同的结果）和 nonce 确定，帧序号作为派生参数
+        self.__entropy = int.from_bytes(hashlib.sha256(crypto._key_fingerprint_data(key) + self.nonce).digest(),
+                                        'big')
+
+    def mask(self, index: int, shape) -> np.ndarray:
+        """第 index 帧的掩码（新分配的 uint8 数组）"""
+        size = int(np.prod(shape))
+        bit_generator = np.random.PCG64(np.random.SeedSequence(self.__entropy, spawn_key=(index,)))
+        words = bit_generator.random_raw(-(-size // 8)).astype('<u8', copy=False)
+        return words.view(np.uint8)[:size].reshape(shape)
+
+    def __read_frames(self):
+        if hasattr(self.__frames, 'read'):
+            while True:
+                ok, frame = self.__frames.read()
+                if not ok:
+                    return
+                yield frame
+        else:
+            yield from self.__frames
+
+    def __iter__(self):
+        frames = self.__read_frames()
+        first = next(frames, None)
+        if first is None:
+            return
+        if self.shape is None:
+            self.shape = first.shape
+        process = self.crypto._frame_processor(self.key, self.shape, self.decrypt)
+        operation = 'decrypt_frame' if self.decrypt else 'encrypt_frame'
+
+        def run(index, frame):
+            assert frame.dtype == np.uint8, f"帧必须为 uint8 图像: {frame.dtype}"
+            with self.crypto._measure(operation, frame):
+                if self.decrypt:
+                    result = process(frame)
+                    return np.bitwise_xor(result, self.mask(index, result.shape), out=result)
+                assert frame.shape == self.shape, f"同一个流中的帧尺寸必须相同: {frame.shape} != {self.shape}"
+                mask = self.mask(index, frame.shape)
+                return process(np.bitwise_xor(mask, frame, out=mask))
+
+        frames = enumerate(itertools.chain([first], frames), self.start)
+        if self.workers <= 1:
+            for index, frame in frames:
+                yield run(index, frame)
+            return
+
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(self.workers)
+        try:
+            pending = deque()
+            for index, frame in frames:
+                if len(pending) >= self.workers:
+                    yield pending.popleft().result()
+                pending.append(pool.submit(run, index, frame))
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            pool.shutdown(cancel_futures=True)
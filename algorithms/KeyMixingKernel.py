@@ -0,0 +1,173 @@
+"""LogisticKeyMixingCrypto 的逐像素内层循环及其可插拔后端
+
+每个像素都依赖前一个像素的结果（x/y 状态随像素值更新），只能顺序执行。
+这里将内层循环写成只使用标量运算和一维下标的函数：
+- 'python' 后端直接在 Python 列表上运行该函数；
+- 'numba'  后端（需安装 numba，可选依赖）将同一份源码编译为机器码，在连续的 uint8 缓冲区上运行。
+两种后端执行完全相同的浮点与整数运算，结果与原始实现逐字节一致。
+
+13 位密钥的演化与像素值无关，由 key_schedule 预先生成为 (行数 × 13) 的 uint8 表；
+该演化是可逆映射，状态必然回到初值，因此只需保存一个周期，内层循环只保留与数据相关的部分。
+"""
+import importlib.util
+
+import numpy as np
+
+from .LRUCache import LRUCache
+
+# numba 为可选依赖，且导入本身需要数百毫秒：这里只检查是否已安装，首次编译时才真正导入
+_has_numba = importlib.util.find_spec('numba') is not None
+
+
+# 所有实例共享的密钥调度缓存：13 位初始密钥 -> (调度表, 是否为完整周期)
+schedule_cache = LRUCache(max_entries=64, max_bytes=64 * 1024 * 1024)
+
+
+def _next_key(key_list):
+    """密钥列表演化一步（与 LogisticKeyMixingCrypto.__update_values 中的密钥更新相同）"""
+    for i in range(12):
+        key_list[i] = (key_list[i] + key_list[12]) % 256
+        key_list[12] ^= key_list[i]
+
+
+def key_schedule(key_list, length):
+    """生成密钥调度表，第 p 行为处理第 p 个像素时使用的 13 位密钥
+
+    Returns:
+        schedule: (行数 × 13) 的 uint8 表，第 p 个像素使用第 p % 行数 行
+        若周期不超过 length，表中恰为一个完整周期；否则表长不小于 length
+    """
+    initial = tuple(key_list)
+    cached = schedule_cache.get(initial)
+    if cached is not None:
+        schedule, is_cycle = cached
+        if is_cycle or len(schedule) >= length:
+            return schedule
+        # 已有前缀，从最后一行的下一个状态继续生成
+        rows = [tuple(row) for row in schedule.tolist()]
+        state = list(rows[-1])
+        _next_key(state)
+    else:
+        rows, state = [], list(key_list)
+
+    is_cycle = False
+    while len(rows) < length:
+        rows.append(tuple(state))
+        _next_key(state)
+        if tuple(state) == initial:
+            is_cycle = True
+            break
+
+    schedule = np.array(rows, dtype=np.uint8).reshape(-1, 13)
+    schedule.flags.writeable = False
+    schedule_cache.put(initial, (schedule, is_cycle))
+    return schedule
+
+
+def key_mixing_kernel(pixels, out, prev, schedule, x, y, S_x, S_y, channels, decrypt, max_iters):
+    """处理全部像素
+
+    Args:
+        pixels: 一维像素缓冲区，按 (x, y, 通道) 顺序展平
+        out: 与 pixels 等长的输出缓冲区
+        prev: 每个通道的前一个密文值，长度为 channels，原地更新
+        schedule: 密钥调度表，见 key_schedule
+        x, y: 混沌系统的初始状态
+        S_x, S_y: 混沌系统的初始参数
+        channels: 通道数
+        decrypt: 是否为解密
+        max_iters: logistic 迭代的最大次数，负数表示不限制
+    Returns:
+        处理结束后的 x, y
+    """
+    N = 256
+    period = len(schedule)
+    for p in range(len(pixels) // channels):
+        key_list = schedule[p % period]
+
+        # 应用Logistic混沌映射
+        # x 恰好为不动点 0.75 时原实现会陷入死循环，这里停在不动点上（与解密限制迭代次数时的结果相同），
+        # 其余情况下的迭代过程不变
+        count = 0
+        while 0.2 < x < 0.8 and (max_iters < 0 or count < max_iters):
+            x_next = 4 * x * (1 - x)
+            if x_next == x:
+                break
+            x = x_next
+            count += 1
+        count = 0
+        while 0.2 < y < 0.8 and (max_iters < 0 or count < max_iters):
+            y_next = 4 * y * (1 - y)
+            if y_next == y:
+                break
+            y = y_next
+            count += 1
+
+        # 生成随机数
+        x_r = int(round((x * 10 ** 4) % 256))
+        y_r = int(round((y * 10 ** 4) % 256))
+
+        # 生成混淆值
+        C1 = x_r ^ ((key_list[0] + x_r) % N) ^ ((S_x + key_list[1]) % N)
+        C2 = x_r ^ ((key_list[2] + y_r) % N) ^ ((S_y + key_list[3]) % N)
+        mix = ((key_list[4] + C1) % N) ^ ((key_list[5] + C2) % N)
+
+        base = p * channels
+        if not decrypt:
+            for k in range(channels):
+                prev[k] = mix ^ ((key_list[6] + pixels[base + k]) % N) ^ ((prev[k] + key_list[7]) % N)
+                out[base + k] = prev[k]
+            C = prev[0]
+        else:
+            for k in range(channels):
+                value = pixels[base + k]
+                out[base + k] = ((mix ^ ((prev[k] + key_list[7]) % N) ^ value) + N - key_list[6]) % N
+                prev[k] = value
+            C = pixels[base]
+
+        # 更新混沌参数
+        x = (x + C / 256 + key_list[8] / 256 + key_list[9] / 256) % 1
+        y = (x + C / 256 + key_list[8] / 256 + key_list[9] / 256) % 1
+    return x, y
+
+
+def _run_python(pixels, prev, schedule, x, y, S_x, S_y, channels, decrypt, max_iters):
+    """纯 Python 后端：在列表上运行，避免 numpy 标量运算的开销"""
+    out = [0] * pixels.size
+    key_mixing_kernel(pixels.tolist(), out, list(prev), schedule.tolist(), float(x), float(y),
+                      S_x, S_y, channels, decrypt, max_iters)
+    return np.array(out, dtype=np.uint8)
+
+
+_numba_kernel = None
+
+
+def compiled_kernel():
+    """numba 编译的 key_mixing_kernel（首次调用时编译），可直接在调用方管理的缓冲区上运行：
+    pixels / out 为连续的 uint8 缓冲区，prev 与 schedule 为 int64 数组"""
+    global _numba_kernel
+    if _numba_kernel is None:
+        import numba
+        _numba_kernel = numba.njit(cache=True, nogil=True)(key_mixing_kernel)
+    return _numba_kernel
+
+
+def _run_numba(pixels, prev, schedule, x, y, S_x, S_y, channels, decrypt, max_iters):
+    """numba 后端：首次调用时编译，之后直接在连续的 uint8 缓冲区上运行"""
+    out = np.empty_like(pixels)
+    compiled_kernel()(pixels, out, np.array(prev, dtype=np.int64), schedule.astype(np.int64),
+                      float(x), float(y), S_x, S_y, channels, decrypt, max_iters)
+    return out
+
+
+BACKENDS = {'python': _run_python}
+if _has_numba:
+    BACKENDS['numba'] = _run_numba
+
+
+def get_backend(name='auto'):
+    """获取内层循环后端，'auto' 时优先使用 numba"""
+    if name == 'auto':
+        name = 'numba' if 'numba' in BACKENDS else 'python'
+    assert name in BACKENDS, f"不可用的后端: {name}，可选: {list(BACKENDS)}"
+    return BACKENDS[name]
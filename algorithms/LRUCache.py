@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """按最近最少使用 (LRU) 策略淘汰的缓存，可同时限制条目数和占用字节数
+
+    主要用于缓存与密钥、图像尺寸相关的预计算数组（置换索引、混沌序列等），
+    值若带有 nbytes 属性（如 np.ndarray）则计入字节占用。
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        """
+        max_entries: 最多缓存的条目数，None 表示不限制
+        max_bytes: 最多占用的字节数，None 表示不限制
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self.__data = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def __sizeof(value):
+        if isinstance(value, (tuple, list)):
+            return sum(getattr(v, 'nbytes', 0) for v in value)
+        return getattr(value, 'nbytes', 0)
+
+    def get(self, key, default=None):
+        """查找缓存，命中时将该条目标记为最近使用"""
+        with self.__lock:
+            if key in self.__data:
+                self.__data.move_to_end(key)
+                self.hits += 1
+                return self.__data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """写入缓存，超出容量时从最久未使用的条目开始淘汰"""
+        size = self.__sizeof(value)
+        with self.__lock:
+            if key in self.__data:
+                self.nbytes -= self.__sizeof(self.__data.pop(key))
+            if self.max_bytes is not None and size > self.max_bytes:
+                return value  # 单个条目超过容量上限时不缓存
+            self.__data[key] = value
+            self.nbytes += size
+            while (self.max_entries is not None and len(self.__data) > self.max_entries) or \
+                    (self.max_bytes is not None and self.nbytes > self.max_bytes):
+                _, evicted = self.__data.popitem(last=False)
+                self.nbytes -= self.__sizeof(evicted)
+                self.evictions += 1
+        return value
+
+    def get_or_create(self, key, factory):
+        """命中则直接返回，否则调用 factory() 生成并写入缓存"""
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, factory())
+        return value
+
+    def clear(self):
+        with self.__lock:
+            self.__data.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """返回命中/未命中等统计信息，便于在生产环境中调整缓存大小"""
+        with self.__lock:
+            return {
+                'entries': len(self.__data),
+                'nbytes': self.nbytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def __getstate__(self):
+        # 传递到其他进程时只保留容量配置，缓存内容在各进程中重新生成
+        return {'max_entries': self.max_entries, 'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __contains__(self, key):
+        return key in self.__data
@@ -1,15 +1,30 @@
+import hashlib
+import os
 from .BaseCrypto import *
+from .ChaoticKeystream import ChaoticKeystream
+from .LRUCache import LRUCache
 
 class LogisticCrypto(BaseCrypto):
-    def __init__(self, key=None):
+    # 所有实例共享的置乱置换缓存：(r, x0, w * h) -> (置换, 逆置换)
+    permutation_cache = LRUCache(max_entries=16, max_bytes=256 * 1024 * 1024)
+
+    def __init__(self, key=None, engine='numpy', cache_dir=None):
         """
-        key: 元组 (r, x0)
+        key: 元组 (r, x0, n)
         r: logistic参数，取值范围[3.57,4]
         x0: 初始值，取值范围[0,1]
+        n: 置乱-扩散的轮数
+        engine: 'numpy' -> 基于 ndarray 的向量化实现
+                'reference' -> 原始的逐像素实现，用于等价性验证
+        cache_dir: 可选，置乱置换的磁盘缓存目录，进程重启后可直接加载
         """
         super().__init__(key)
+        assert engine in ('numpy', 'reference'), f"不支持的引擎: {engine}"
+        self.engine = engine
+        self.cache_dir = cache_dir
 
     def __get_image_matrix(self, img):
+        from PIL import Image  # 仅参考实现使用，按需导入
         im = Image.fromarray(img)
         pix = im.load()
         color = isinstance(pix[0, 0], tuple)
@@ -58,8 +73,13 @@ class LogisticCrypto(BaseCrypto):
 
     def __process_image(self, img, operation, key):
         """统一的图像处理函数，用于加密和解密"""
-        time_start = time.time()
+        with self._measure(operation, img) as measurement:
+            if self.engine == 'reference':
+                return self.__process_image_reference(img, operation, key)
+            return self.__process_image_numpy(img, operation, key, measurement)
 
+    def __process_image_reference(self, img, operation, key):
+        """原始的逐像素实现（参考实现），用于加密和解密"""
         _, _, n = key
 
         # 获取图像信息
@@ -71,7 +91,7 @@ class LogisticCrypto(BaseCrypto):
         # 生成用于扩散的混沌序列
         diffuse_seq = self.__logistic_sequence(w * h * (3 if color else 1), key)
 
-        for _ in tqdm(range(n)):
+        for _ in self._progress(range(n)):
 
             # 置乱过程
             if operation == 'encrypt':
@@ -115,17 +135,247 @@ class LogisticCrypto(BaseCrypto):
 
         # 构建处理后的图像
         mode = "RGB" if color else "L"
+        from PIL import Image
         im = Image.new(mode, (w, h))
 
         for x in range(w):
             for y in range(h):
                 im.putpixel((x, y), matrix[x][y])
 
-        time_end = time.time()
-        print(f"{operation.capitalize()} time: {time_end - time_start:.2f}s")
-
         return np.array(im)
 
+    def __shuffle_permutation(self, chaos_seq, size):
+        """Fisher-Yates 置乱得到的位置索引，等价于 __shuffle_matrix 中的 indices"""
+        indices = list(range(size))
+        for i in range(size - 1, 0, -1):
+            j = chaos_seq[i] % (i + 1)
+            indices[i], indices[j] = indices[j], indices[i]
+        # 使用尽可能紧凑的整数类型保存索引
+        return np.array(indices, dtype=np.uint16 if size <= 1 << 16 else np.uint32)
+
+    def __get_permutations(self, r, x0, size):
+        """获取置乱置换及其逆置换：内存缓存 -> 磁盘缓存 -> 重新计算"""
+        cache_key = (r, x0, size)
+        cached = self.permutation_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        path = None
+        if self.cache_dir is not None:
+            digest = hashlib.sha1(repr(cache_key).encode()).hexdigest()
+            path = os.path.join(self.cache_dir, f"logistic_perm_{digest}.npy")
+            if os.path.exists(path):
+                permutation = np.load(path)
+                if len(permutation) == size:
+                    return self.permutation_cache.put(cache_key, (permutation, self.__invert(permutation)))
+
+        # 置乱序列即密钥流的前 size 项
+        shuffle_seq = ChaoticKeystream(r, x0).generate(size).tolist()
+        permutation = self.__shuffle_permutation(shuffle_seq, size)
+
+        if path is not None:
+            # 先写临时文件再原子替换，避免多个进程同时写入时读到不完整的文件
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, permutation)
+            os.replace(tmp_path, path)
+
+        return self.permutation_cache.put(cache_key, (permutation, self.__invert(permutation)))
+
+    @staticmethod
+    def __invert(permutation):
+        """逆置换：inverse[permutation[i]] = i"""
+        inverse = np.empty_like(permutation)
+        inverse[permutation] = np.arange(len(permutation), dtype=permutation.dtype)
+        return inverse
+
+    def __process_image_numpy(self, img, operation, key, measurement=NULL_MEASUREMENT):
+        """基于 ndarray 的向量化实现，输出与参考实现逐字节相同"""
+        _, _, n = key
+
+        # 参考实现按 (x, y) 即列优先的顺序遍历像素，这里转置后展平以保持相同的顺序
+        h, w = img.shape[:2]
+        color = img.ndim == 3
+        channels = img.shape[2] if color else 1
+        with measurement.phase('setup'):
+            pixels = np.ascontiguousarray(np.swapaxes(img, 0, 1)).reshape(w * h, channels)
+
+        # 置乱序列是扩散序列的前缀，同一密钥的后续调用直接命中缓存
+        r, x0, _ = key
+        with measurement.phase('keystream'):
+            diffuse_seq = ChaoticKeystream(r, x0).generate(w * h * channels)
+
+        # 置换只与密钥和图像尺寸有关，每轮复用；逆置乱即为置乱置换的逆置换
+        # 注：各轮之间夹有扩散，置换无法跨轮合并
+        with measurement.phase('permute'):
+            permutation, inverse = self.__get_permutations(r, x0, w * h)
+        if operation == 'decrypt':
+            permutation = inverse
+
+        for _ in self._progress(range(n)):
+            if operation == 'encrypt':
+                # 置乱过程
+                with measurement.phase('permute'):
+                    pixels = np.take(pixels, permutation, axis=0)
+                # 扩散过程：c_i = p_i ^ k_i ^ c_{i-1}，即 p ^ k 的前缀异或
+                with measurement.phase('diffuse'):
+                    flat = np.bitwise_xor.accumulate(pixels.reshape(-1) ^ diffuse_seq)
+            else:
+                # 解密：p_i = c_i ^ k_i ^ c_{i-1}，可完全并行
+                with measurement.phase('diffuse'):
+                    cipher = pixels.reshape(-1)
+                    prev = np.empty_like(cipher)
+                    prev[0] = 0
+                    prev[1:] = cipher[:-1]
+                    flat = cipher ^ diffuse_seq ^ prev
+            pixels = flat.reshape(w * h, channels)
+
+            if operation == 'decrypt':
+                # 逆置乱过程
+                with measurement.phase('permute'):
+                    pixels = np.take(pixels, permutation, axis=0)
+
+        with measurement.phase('reassembly'):
+            result = np.swapaxes(pixels.reshape(w, h, channels), 0, 1)
+            return np.ascontiguousarray(result if color else result[:, :, 0])
+
+    def _derive_tile_key(self, key, index, shape):
+        """分块模式：第 index 个分块的初值 x0 按黄金分割比例偏移，保持在 (0, 1) 内"""
+        r, x0, n = key
+        return r, (x0 + index * 0.6180339887498949) % 1 or 0.5 ** 20, n
+
+    def _prepare_batch(self, key, shape, decrypt):
+        """预先生成该尺寸所需的密钥流和置乱置换"""
+        if self.engine == 'numpy':
+            r, x0, _ = key
+            h, w = shape[:2]
+            channels = shape[2] if len(shape) == 3 else 1
+            ChaoticKeystream(r, x0).generate(w * h * channels)
+            self.__get_permutations(r, x0, w * h)
+
+    def __row_major_state(self, key, shape, decrypt):
+        """将置乱置换与密钥流换算到图像本身的行优先布局，返回 (np.take 的索引, (h, w, channels) 的密钥流)"""
+        r, x0, _ = key
+        h, w = shape[:2]
+        channels = shape[2] if len(shape) == 3 else 1
+
+        # 行优先序号 q = y * w + x 对应的列优先序号 p = x * h + y，以及反方向的对应关系
+        y, x = np.divmod(np.arange(h * w), w)
+        column_of_row = x * h + y
+        row_of_column = np.empty_like(column_of_row)
+        row_of_column[column_of_row] = np.arange(h * w)
+
+        permutation, inverse = self.__get_permutations(r, x0, w * h)
+        # 索引预先转换为 intp，np.take 无需每次转换索引类型
+        index = row_of_column[(inverse if decrypt else permutation)[column_of_row]].astype(np.intp)
+        keystream = ChaoticKeystream(r, x0).generate(w * h * channels) \
+            .reshape(w * h, channels)[column_of_row].reshape(h, w, channels)
+        return index, keystream
+
+    def _frame_processor(self, key, shape, decrypt):
+        """视频流：直接在图像本身的行优先布局上完成置乱与扩散，省去每帧进出列优先顺序的两次转置
+
+        置乱置换与密钥流在流开始时换算到行优先布局；列优先顺序上的前缀异或与"前一个像素"
+        均可在行优先布局上按列计算（见 __column_major_prefix_xor），结果与 encrypt / decrypt 逐字节一致。
+        """
+        if self.engine != 'numpy':
+            return super()._frame_processor(key, shape, decrypt)
+        _, _, n = key
+        h, w = shape[:2]
+        channels = shape[2] if len(shape) == 3 else 1
+        index, keystream = self.__row_major_state(key, shape, decrypt)
+
+        def process(frame):
+            if n == 0:
+                # 零轮时不做任何变换，返回副本而不是输入的视图（调用方可能就地修改结果，如 FrameStream 的掩码）
+                return frame.reshape(shape).copy()
+            pixels = frame.reshape(h, w, channels)
+            for _ in range(n):
+                if not decrypt:
+                    pixels = np.take(pixels.reshape(h * w, channels), index, axis=0).reshape(h, w, channels)
+                    pixels ^= keystream
+                    self.__column_major_prefix_xor(pixels)
+                else:
+                    cipher = pixels
+                    pixels = cipher ^ keystream
+                    self.__xor_column_major_previous(pixels, cipher)
+                    pixels = np.take(pixels.reshape(h * w, channels), index, axis=0).reshape(h, w, channels)
+            return pixels.reshape(shape)
+        return process
+
+    def _plan_processor(self, key, shape, dtype, decrypt):
+        """与 _frame_processor 相同的行优先算法，各轮在 out 与预先分配的中间缓冲区之间交替，不分配新数组"""
+        if self.engine != 'numpy':
+            return super()._plan_processor(key, shape, dtype, decrypt)
+        assert dtype == np.uint8, f"LogisticCrypto 只支持 uint8 图像: {dtype}"
+        _, _, n = key
+        h, w = shape[:2]
+        channels = shape[2] if len(shape) == 3 else 1
+        index, keystream = self.__row_major_state(key, shape, decrypt)
+        scratch = np.empty((h, w, channels), dtype=np.uint8)
+        buffers = self.__prefix_xor_buffers(h, w)
+
+        def process(img, out):
+            source = img.reshape(h, w, channels)
+            result = out.reshape(h, w, channels)
+            if n == 0:
+                np.copyto(result, source)
+            for i in range(n):
+                if not decrypt:
+                    # 置乱不能原地进行：按轮数的奇偶选择目标，使最后一轮恰好写入 out
+                    target = result if (n - 1 - i) % 2 == 0 else scratch
+                    np.take(source.reshape(h * w, channels), index, axis=0, out=target.reshape(h * w, channels),
+                            mode='clip')
+                    target ^= keystream
+                    self.__column_major_prefix_xor(target, buffers)
+                    source = target
+                else:
+                    np.bitwise_xor(source, keystream, out=scratch)
+                    self.__xor_column_major_previous(scratch, source)
+                    np.take(scratch.reshape(h * w, channels), index, axis=0, out=result.reshape(h * w, channels),
+                            mode='clip')
+                    source = result
+            return out
+        return process, tuple(shape)
+
+    @staticmethod
+    def __prefix_xor_buffers(h, w):
+        """__column_major_prefix_xor 的中间缓冲区"""
+        return np.empty((h, w), dtype=np.uint8), np.empty((h, w), dtype=np.uint8), np.empty(w, dtype=np.uint8)
+
+    @classmethod
+    def __column_major_prefix_xor(cls, pixels, buffers=None):
+        """按列优先顺序（x, y, 通道）对 (h, w, channels) 数组原地求前缀异或，拆分为三步：
+        像素内各通道、同一列内的各行、各列之间
+
+        均按通道平面逐个运算：对长度仅为 channels 的最内层轴做广播时，numpy 的内层循环过短，慢数倍。
+        buffers: 可选，__prefix_xor_buffers 分配的中间缓冲区，为 None 时临时分配
+        """
+        h, w, channels = pixels.shape
+        column, before, carry = buffers if buffers is not None else cls.__prefix_xor_buffers(h, w)
+        for c in range(1, channels):
+            pixels[:, :, c] ^= pixels[:, :, c - 1]
+        # column[y, x]：第 x 列中第 0 ~ y 行全部元素的异或；逐行累积比 accumulate(axis=0) 快
+        np.copyto(column, pixels[:, :, -1])
+        for y in range(1, h):
+            np.bitwise_xor(column[y], column[y - 1], out=column[y])
+        np.bitwise_xor.accumulate(column[-1], out=carry)
+        # before[y, x]：列优先顺序中位于像素 (y, x) 之前的全部元素的异或
+        before[0] = 0
+        before[1:] = column[:-1]
+        before[:, 1:] ^= carry[:-1]
+        for c in range(channels):
+            pixels[:, :, c] ^= before
+
+    @staticmethod
+    def __xor_column_major_previous(pixels, cipher):
+        """pixels 与 cipher 中按列优先顺序的前一个元素原地异或（第一个元素的前一个视为 0）"""
+        for c in range(1, pixels.shape[2]):
+            pixels[:, :, c] ^= cipher[:, :, c - 1]
+        pixels[1:, :, 0] ^= cipher[:-1, :, -1]
+        pixels[0, 1:, 0] ^= cipher[-1, :-1, -1]
+
     def encrypt(self, img: np.ndarray) -> np.ndarray:
         return self.__process_image(img, 'encrypt', self.key)
 
@@ -134,6 +384,8 @@ class LogisticCrypto(BaseCrypto):
 
 
 if __name__ == "__main__":
+    import cv2
+
     key = (3.6, 0.6, 3)
     logistic = LogisticCrypto(key)
     img = cv2.imread("../assets/hust.jpg")
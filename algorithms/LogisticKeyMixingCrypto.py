@@ -1,16 +1,33 @@
 from .BaseCrypto import *
+from .ChaoticKeystream import ChaoticKeystream
+from . import KeyMixingKernel
 
 
 class LogisticKeyMixingCrypto(BaseCrypto):
-    def __init__(self, key=None):
+    def __init__(self, key=None, backend='auto'):
         """初始化加密类
         Args:
             key: 加密密钥字符串
+            backend: 逐像素内层循环的后端
+                     'auto' -> 已安装 numba 时使用 'numba'，否则使用 'python'
+                     'python' / 'numba' -> 见 KeyMixingKernel
+                     'reference' -> 原始实现，用于等价性验证
         """
         super().__init__(key)
+        if backend != 'reference':
+            KeyMixingKernel.get_backend(backend)  # 尽早检查后端是否可用
+        self.backend = backend
+        self._set_key(key)
+
+    def _set_key(self, key):
+        super()._set_key(key)
         # 将密钥字符串转换为ASCII码列表并扩展到13位
         self.key_list = self.__extend_key([ord(x) for x in key])
 
+    def _derive_tile_key(self, key, index, shape):
+        """分块模式：第 index 个分块的密钥为 key + '#index'"""
+        return f"{key}#{index}"
+
     def __extend_key(self, key_list):
         """扩展或压缩密钥到13位
         Args:
@@ -41,6 +58,7 @@ class LogisticKeyMixingCrypto(BaseCrypto):
         Returns:
             像素矩阵, 宽度, 高度, 是否为彩色图像
         """
+        from PIL import Image  # 仅参考实现使用，按需导入
         im = Image.fromarray(img)
         pix = im.load()
         color = isinstance(pix[0, 0], tuple)  # 判断是否为彩色图像
@@ -98,6 +116,67 @@ class LogisticKeyMixingCrypto(BaseCrypto):
             key_list[12] ^= key_list[i]
         return x, y, key_list
 
+    def __kernel_args(self, key, decrypt):
+        """内层循环的初始参数：13 位密钥, x, y, S_x, S_y, 初始的前一个密文值 C, logistic 迭代的最大次数"""
+        key_list = self.__extend_key([ord(x) for x in key])
+        S_x, S_y, L_x, L_y = self.__init_params(key_list)
+        # 与原实现相同：解密时限制 logistic 迭代的次数，加密时不限制
+        return (key_list, 4 * S_x * (1 - S_x), 4 * S_y * (1 - S_y), S_x, S_y,
+                round((L_x * L_y * 10 ** 4) % 256), 100 if decrypt else -1)
+
+    def __process_image(self, img, key_list, x, y, S_x, S_y, C, max_iters, decrypt, measurement):
+        """使用可插拔后端处理图像，结果与原始实现逐字节一致"""
+        # 原始实现按 (x, y) 即列优先的顺序遍历像素，这里转置后展平以保持相同的顺序
+        h, w = img.shape[:2]
+        channels = img.shape[2] if img.ndim == 3 else 1
+        with measurement.phase('setup'):
+            pixels = np.ascontiguousarray(np.swapaxes(img, 0, 1), dtype=np.uint8).reshape(-1)
+
+        # 密钥演化与像素值无关，预先生成（并缓存）调度表，内层循环只处理与数据相关的部分
+        with measurement.phase('keystream'):
+            schedule = KeyMixingKernel.key_schedule(key_list, w * h)
+        with measurement.phase('diffuse'):
+            run = KeyMixingKernel.get_backend(self.backend)
+            out = run(pixels, [C] * channels, schedule, x, y, S_x, S_y, channels, decrypt, max_iters)
+
+        with measurement.phase('reassembly'):
+            result = np.swapaxes(out.reshape(w, h, channels), 0, 1)
+            return np.ascontiguousarray(result if img.ndim == 3 else result[:, :, 0])
+
+    def _prepare_batch(self, key, shape, decrypt):
+        """预先生成密钥调度表，并完成内层循环后端的编译（numba 首次调用时编译）"""
+        if self.backend == 'reference':
+            return
+        key_list = self.__extend_key([ord(x) for x in key])
+        schedule = KeyMixingKernel.key_schedule(key_list, shape[0] * shape[1])
+        run = KeyMixingKernel.get_backend(self.backend)
+        run(np.zeros(1, dtype=np.uint8), [0], schedule, 0.0, 0.0, 0, 0, 1, decrypt, 1)
+
+    def _plan_processor(self, key, shape, dtype, decrypt):
+        """numba 后端：int64 的密钥调度表、初始参数与列优先顺序的像素缓冲区在 prepare 时准备好，
+        每次调用只复制像素并运行内层循环；其他后端使用默认实现"""
+        if self.backend == 'reference' or KeyMixingKernel.get_backend(self.backend) is not \
+                KeyMixingKernel.BACKENDS.get('numba'):
+            return super()._plan_processor(key, shape, dtype, decrypt)
+        assert dtype == np.uint8, f"LogisticKeyMixingCrypto 只支持 uint8 图像: {dtype}"
+        h, w = shape[:2]
+        channels = shape[2] if len(shape) == 3 else 1
+        key_list, x, y, S_x, S_y, C, max_iters = self.__kernel_args(key, decrypt)
+        schedule = KeyMixingKernel.key_schedule(key_list, w * h).astype(np.int64)
+        kernel = KeyMixingKernel.compiled_kernel()
+        pixels = np.empty((w, h, channels), dtype=np.uint8)
+        result = np.empty_like(pixels)
+        prev = np.empty(channels, dtype=np.int64)
+
+        def process(img, out):
+            np.copyto(pixels, np.swapaxes(img.reshape(h, w, channels), 0, 1))
+            prev.fill(C)
+            kernel(pixels.reshape(-1), result.reshape(-1), prev, schedule, x, y, S_x, S_y, channels, decrypt,
+                   max_iters)
+            np.copyto(out.reshape(h, w, channels), np.swapaxes(result, 0, 1))
+            return out
+        return process, tuple(shape)
+
     def encrypt(self, img: np.ndarray) -> np.ndarray:
         """加密图像
         Args:
@@ -105,8 +184,15 @@ class LogisticKeyMixingCrypto(BaseCrypto):
         Returns:
             加密后的图像
         """
-        time_start = time.time()
+        with self._measure('encrypt', img) as measurement:
+            if self.backend == 'reference':
+                return self.__encrypt_reference(img)
 
+            return self.__process_image(img, *self.__kernel_args(self.key, False), decrypt=False,
+                                        measurement=measurement)
+
+    def __encrypt_reference(self, img):
+        """原始的逐像素加密实现（参考实现）"""
         N = 256  # 像素值范围
         key_list = self.key_list.copy()
         # 初始化混沌系统参数
@@ -123,12 +209,12 @@ class LogisticKeyMixingCrypto(BaseCrypto):
         encrypted = []
 
         # 处理每个像素
-        for i in tqdm(range(w)):
+        for i in self._progress(range(w)):
             row = []
             for j in range(h):
                 # 应用Logistic混沌映射
-                while 0.2 < x < 0.8: x = 4 * x * (1 - x)
-                while 0.2 < y < 0.8: y = 4 * y * (1 - y)
+                x = ChaoticKeystream.escape(x)
+                y = ChaoticKeystream.escape(y)
 
                 # 生成随机数
                 x_r = round((x * 10 ** 4) % 256)
@@ -160,14 +246,12 @@ class LogisticKeyMixingCrypto(BaseCrypto):
 
         # 转换回图像格式
         mode = "RGB" if color else "L"
+        from PIL import Image
         im = Image.new(mode, (w, h))
         for x in range(w):
             for y in range(h):
                 im.putpixel((x, y), encrypted[x][y])
 
-        time_end = time.time()
-        print(f"Encryption time: {time_end - time_start:.2f}s")
-
         return np.array(im)
 
     def decrypt(self, img: np.ndarray, key) -> np.ndarray:
@@ -178,8 +262,15 @@ class LogisticKeyMixingCrypto(BaseCrypto):
         Returns:
             解密后的图像
         """
-        time_start = time.time()
+        with self._measure('decrypt', img) as measurement:
+            if self.backend == 'reference':
+                return self.__decrypt_reference(img, key)
+
+            return self.__process_image(img, *self.__kernel_args(key, True), decrypt=True,
+                                        measurement=measurement)
 
+    def __decrypt_reference(self, img, key):
+        """原始的逐像素解密实现（参考实现）"""
         N = 256
         # 从密钥生成初始参数
         key_list = self.__extend_key([ord(x) for x in key])
@@ -187,7 +278,7 @@ class LogisticKeyMixingCrypto(BaseCrypto):
 
         # 初始化混沌系统
         x = 4 * S_x * (1 - S_x)
-        y = 4 * L_x * (1 - S_y)
+        y = 4 * S_y * (1 - S_y)  # 与加密时的初值一致（原先误用了 L_x，导致第一个像素无法正确解密）
         C = round((L_x * L_y * 10 ** 4) % 256)
         I_prev = [C] * 4  # [I, I_r, I_g, I_b] 用于存储前一个像素值
 
@@ -196,20 +287,12 @@ class LogisticKeyMixingCrypto(BaseCrypto):
         decrypted = []
 
         # 处理每个像素
-        for i in tqdm(range(w)):
+        for i in self._progress(range(w)):
             row = []
             for j in range(h):
                 # 应用Logistic映射，加入最大迭代次数避免死循环
-                max_iters = 100
-                count = 0
-                while 0.2 < x < 0.8 and count < max_iters:
-                    x = 4 * x * (1 - x)
-                    count += 1
-
-                count = 0
-                while 0.2 < y < 0.8 and count < max_iters:
-                    y = 4 * y * (1 - y)
-                    count += 1
+                x = ChaoticKeystream.escape(x, max_iters=100)
+                y = ChaoticKeystream.escape(y, max_iters=100)
 
                 # 生成随机数
                 x_r = round((x * 10 ** 4) % 256)
@@ -241,18 +324,18 @@ class LogisticKeyMixingCrypto(BaseCrypto):
 
         # 转换回图像格式
         mode = "RGB" if color else "L"
+        from PIL import Image
         im = Image.new(mode, (w, h))
         for x in range(w):
             for y in range(h):
                 im.putpixel((x, y), decrypted[x][y])
 
-        time_end = time.time()
-        print(f"Decryption time: {time_end - time_start:.2f}s")
-
         return np.array(im)
 
 
 if __name__ == "__main__":
+    import cv2
+
     # 测试代码
     key = "test"
     logistic = LogisticKeyMixingCrypto(key)
@@ -1,111 +1,497 @@
+import itertools
 import struct
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Tuple
 from Crypto.PublicKey import RSA
-from Crypto.Cipher import PKCS1_OAEP
+from Crypto.Cipher import AES, PKCS1_OAEP
+from Crypto.Random import get_random_bytes
 from .BaseCrypto import *
 
 
+# 进程池中每个工作进程持有的 cipher，由 _init_block_worker 在进程启动时创建一次
+_worker_cipher = None
+
+
+def _init_block_worker(key_der: bytes):
+    global _worker_cipher
+    _worker_cipher = PKCS1_OAEP.new(RSA.import_key(key_der))
+
+
+def _crypt_blocks(cipher, data: bytes, step: int, mode: str, progress: bool = False, strict: bool = False) -> list:
+    """顺序处理 data 中的每个块
+
+    解密时 strict=False（旧格式，密文长度未知）会跳过全零的填充块和不完整的块，
+    并逐块捕获异常以跳过无效的块；strict=True（已知确切密文长度）时不做逐块的异常处理，
+    任一块解密失败即抛出 ValueError。
+    """
+    result = []
+    zero_block = bytes(step)
+    offsets = range(0, len(data), step)
+    if progress:
+        from tqdm.auto import tqdm
+        offsets = tqdm(offsets)
+    for i in offsets:
+        check_cancelled()
+        block = data[i:i + step]
+        if mode == 'encrypt':
+            result.append(cipher.encrypt(block))
+        elif strict:
+            result.append(cipher.decrypt(block))
+        elif len(block) == step and block != zero_block:
+            try:
+                result.append(cipher.decrypt(block))
+            except ValueError:
+                continue  # 跳过无效的块
+    return result
+
+
+def _rechunk(chunks, size: int, max_bytes: int):
+    """将任意长度的字节块重新划分为批次：每批长度为 size 的整数倍且不超过 max_bytes，最后一批可能不足
+
+    整块部分以 memoryview 切片的形式产出，只有跨越输入边界的块才会被复制。
+    """
+    max_bytes = max(size, max_bytes - max_bytes % size)
+    pending = bytearray()
+    for chunk in chunks:
+        view = memoryview(chunk).cast('B')
+        if pending:
+            take = min(size - len(pending), len(view))
+            pending += view[:take]
+            view = view[take:]
+            if len(pending) < size:
+                continue
+            yield bytes(pending)
+            pending = bytearray()
+        full = len(view) - len(view) % size
+        for i in range(0, full, max_bytes):
+            yield view[i:min(i + max_bytes, full)]
+        pending += view[full:]
+    if pending:
+        yield bytes(pending)
+
+
+def _crypt_blocks_in_worker(data: bytes, step: int, mode: str, strict: bool) -> list:
+    return _crypt_blocks(_worker_cipher, data, step, mode, strict=strict)
+
+
+def _shutdown_pools(pools: dict, wait: bool = True):
+    """关闭并清空 RSACrypto 按密钥缓存的执行器；实例被回收或解释器退出时由 weakref.finalize 调用"""
+    for pool in pools.values():
+        pool.shutdown(wait=wait)
+    pools.clear()
+
+
 class RSACrypto(BaseCrypto):
-    def __init__(self, key: RSA.RsaKey):
+    SESSION_KEY_SIZE = 32  # AES-256
+    NONCE_SIZE = 12
+    TAG_SIZE = 16
+    # 帧尾记录密文的确切长度，解密时直接跳过末尾的零填充
+    TRAILER_MAGIC = b'RSAL'
+    TRAILER_FORMAT = '!4sQ'
+    TRAILER_SIZE = struct.calcsize(TRAILER_FORMAT)
+
+    def __init__(self, key: RSA.RsaKey, mode: str = 'block', workers: int = 1, executor: str = 'process'):
+        """
+        key: RSA 公钥（加密）或私钥
+        mode: 'block'  -> 将图像数据分块后逐块进行 RSA 加密（原有行为）
+              'hybrid' -> RSA 只加密随机会话密钥，图像数据使用 AES-GCM 加密，
+                          每张图像只需一次 RSA 运算
+        workers: 'block' 模式下并行处理的 worker 数，1 表示在当前线程中顺序处理
+        executor: 'process' -> 进程池，每个进程启动时接收一次密钥
+                  'thread'  -> 线程池，pycryptodome 的大数运算在 C 中执行并释放 GIL
+        """
         super().__init__(key)
+        assert mode in ('block', 'hybrid'), f"不支持的模式: {mode}"
+        assert executor in ('process', 'thread'), f"不支持的执行器: {executor}"
+        self.mode = mode
+        self.workers = workers
+        self.executor = executor
+        self.__pools = {}  # 密钥 -> 执行器
+        self.__finalize_pools()
+        self.__ciphers = {}  # 密钥 -> PKCS1_OAEP cipher，在多次调用间复用
         # 根据密钥长度动态设置块大小
         self.encrypted_block_size = key.size_in_bits() // 8  # 加密后的块大小(bytes)
         self.block_size = self.encrypted_block_size - 42  # PKCS1_OAEP填充需要额外41字节，预留42字节以确保安全
 
-    def __process_blocks(self, data: bytes, key: RSA.RsaKey, mode: str) -> bytes:
-        """分块处理数据"""
-        cipher = PKCS1_OAEP.new(key)
-        result = []
+    def __finalize_pools(self):
+        """未调用 close() 的实例被回收时关闭其执行器，避免工作进程一直存活到解释器退出"""
+        weakref.finalize(self, _shutdown_pools, self.__pools, False)
 
-        if mode == 'encrypt':
-            # 计算填充后的数据长度
-            pad_length = self.block_size - (len(data) % self.block_size)
+    @staticmethod
+    def __key_id(key: RSA.RsaKey):
+        return key.n, key.e, key.has_private()
+
+    def __get_cipher(self, key: RSA.RsaKey):
+        """按密钥复用 cipher 对象（私钥的 CRT 参数随 RsaKey 一起保留）"""
+        key_id = self.__key_id(key)
+        if key_id not in self.__ciphers:
+            self.__ciphers[key_id] = PKCS1_OAEP.new(key)
+        return self.__ciphers[key_id]
+
+    def __get_pool(self, key: RSA.RsaKey):
+        """按密钥复用执行器；进程池在 worker 启动时一次性接收密钥"""
+        key_id = self.__key_id(key)
+        if key_id not in self.__pools:
+            if self.executor == 'process':
+                self.__pools[key_id] = ProcessPoolExecutor(self.workers, initializer=_init_block_worker,
+                                                           initargs=(key.export_key(format='DER'),))
+            else:
+                self.__pools[key_id] = ThreadPoolExecutor(self.workers)
+        return self.__pools[key_id]
+
+    def __crypt_blocks(self, data: bytes, key: RSA.RsaKey, step: int, mode: str, strict: bool = False,
+                       bar=None) -> list:
+        """分块加密/解密，workers > 1 时将块区间划分给执行器并行处理，结果保持原有顺序
+
+        bar: 调用方创建的进度条（流式接口的整个流共用一个），给定时本批不再单独显示进度，处理后按块数更新
+        """
+        num_blocks = (len(data) + step - 1) // step
+        progress = self.progress and bar is None
+        if self.workers <= 1 or num_blocks < 2:
+            result = _crypt_blocks(self.__get_cipher(key), data, step, mode, progress=progress, strict=strict)
+        else:
+            result = self.__crypt_blocks_parallel(data, key, step, mode, strict, num_blocks, progress)
+        if bar is not None:
+            bar.update(num_blocks)
+        return result
+
+    def __crypt_blocks_parallel(self, data: bytes, key: RSA.RsaKey, step: int, mode: str, strict: bool,
+                                num_blocks: int, progress: bool) -> list:
+        """将块区间划分给执行器并行处理；progress 为 True 时按区间显示进度"""
+        # 每个 worker 分到若干个连续的块区间（多划分几份以平衡负载）
+        chunk_blocks = max(1, num_blocks // (self.workers * 4))
+        chunks = [bytes(data[i:i + chunk_blocks * step]) for i in range(0, len(data), chunk_blocks * step)]
+
+        pool = self.__get_pool(key)
+        if self.executor == 'process':
+            parts = pool.map(_crypt_blocks_in_worker, chunks, [step] * len(chunks), [mode] * len(chunks),
+                             [strict] * len(chunks))
+        else:
+            # OAEP 的 cipher 对象没有逐次调用的状态，各线程共用按密钥缓存的同一个对象
+            cipher = self.__get_cipher(key)
+            parts = pool.map(lambda chunk: _crypt_blocks(cipher, chunk, step, mode, strict=strict), chunks)
+        if progress:
+            parts = self._progress(parts, total=len(chunks))
+        result = []
+        for part in parts:
+            check_cancelled()
+            result.extend(part)
+        return result
+
+    def __stream_progress(self, total_blocks: int = None):
+        """流式接口整个流共用的进度条（按块计数），progress 为 False 时返回 None"""
+        if not self.progress:
+            return None
+        from tqdm.auto import tqdm
+        return tqdm(total=total_blocks)
+
+    def _prepare_batch(self, key, shape, decrypt):
+        """预先创建该密钥的 cipher 对象"""
+        self.__get_cipher(key)
+
+    def _container_params(self):
+        return {'mode': self.mode}
+
+    def _key_fingerprint_data(self, key):
+        # 公钥与私钥的指纹均取自公钥部分
+        return key.publickey().export_key(format='DER')
+
+    def _export_key(self, key):
+        return key.export_key(format='DER')
+
+    def _import_key(self, data):
+        return RSA.import_key(data)
+
+    def __getstate__(self):
+        # RsaKey、执行器均不可 pickle：密钥以 DER 形式传递，执行器与 cipher 在新进程中重新创建
+        state = super().__getstate__()
+        state['key'] = self._export_key(self.key)
+        state['_RSACrypto__pools'] = {}
+        state['_RSACrypto__ciphers'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.key = self._import_key(self.key)
+        self.__finalize_pools()
+
+    def close(self):
+        """关闭并行处理用到的执行器"""
+        _shutdown_pools(self.__pools)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __process_blocks(self, data: bytes, key: RSA.RsaKey, exact: bool = False) -> bytes:
+        """分块解密数据（加密见 encrypt_stream）
+
+        exact: data 是否恰为完整的密文（由帧尾给出长度），此时不会出现无效的填充块
+        """
+        # 分块解密
+        if exact:
+            try:
+                result = self.__crypt_blocks(data, key, self.encrypted_block_size, 'decrypt', strict=True)
+            except ValueError:
+                result = []  # 密钥错误
+        else:
+            result = self.__crypt_blocks(data, key, self.encrypted_block_size, 'decrypt')
+
+        # 合并解密后的数据
+        decrypted_data = b''.join(result)
+
+        # 去除PKCS7填充
+        if decrypted_data:
+            pad_length = decrypted_data[-1]
             if pad_length < self.block_size:
-                # 添加PKCS7填充
-                data += bytes([pad_length] * pad_length)
-
-            # 分块加密
-            for i in tqdm(range(0, len(data), self.block_size)):
-                block = data[i:i + self.block_size]
-                encrypted_block = cipher.encrypt(block)
-                result.append(encrypted_block)
-
-            # 合并加密后的数据
-            encrypted_data = b''.join(result)
-
-            return encrypted_data
-
-        else:  # decrypt
-            # 分块解密
-            for i in tqdm(range(0, len(data), self.encrypted_block_size)):
-                block = data[i:i + self.encrypted_block_size]
-                try:
-                    decrypted_block = cipher.decrypt(block)
-                    result.append(decrypted_block)
-                except ValueError:
-                    continue  # 跳过无效的块
+                decrypted_data = decrypted_data[:-pad_length]
 
-            # 合并解密后的数据
-            decrypted_data = b''.join(result)
+        return decrypted_data
 
-            # 去除PKCS7填充
-            if decrypted_data:
-                pad_length = decrypted_data[-1]
-                if pad_length < self.block_size:
-                    decrypted_data = decrypted_data[:-pad_length]
-
-            return decrypted_data
+    def __hybrid_decrypt(self, data: bytes, key: RSA.RsaKey) -> bytes:
+        """混合解密，密钥错误或数据被篡改时返回空字节串"""
+        try:
+            envelope = self.__get_cipher(key).decrypt(data[:self.encrypted_block_size])
+            session_key = envelope[:self.SESSION_KEY_SIZE]
+            nonce = envelope[self.SESSION_KEY_SIZE:self.SESSION_KEY_SIZE + self.NONCE_SIZE]
+            length, = struct.unpack('!Q', envelope[self.SESSION_KEY_SIZE + self.NONCE_SIZE:])
+
+            start = self.encrypted_block_size + self.TAG_SIZE
+            tag = data[self.encrypted_block_size:start]
+            ciphertext = data[start:start + length]
+            return AES.new(session_key, AES.MODE_GCM, nonce=nonce).decrypt_and_verify(ciphertext, tag)
+        except (ValueError, struct.error):
+            return b''
 
     def __preprocess_image(self, img: np.ndarray) -> np.ndarray:
         return np.clip(img, 0, 255).astype(np.uint8)
 
-    def encrypt(self, img: np.ndarray) -> np.ndarray:
-        """加密图像"""
-        time_start = time.time()
-
-        # 预处理
-        img = self.__preprocess_image(img)
-        height, width = img.shape[:2]
-        channels = 1 if len(img.shape) == 2 else img.shape[2]
-
-        # 准备图像信息头
-        header = struct.pack('!III', height, width, channels)
-
-        # 准备图像数据
-        img_bytes = img.tobytes()
-
-        # 合并头部和图像数据
-        data = header + img_bytes
-
-        # 加密
-        encrypted_data = self.__process_blocks(data, self.key, 'encrypt')
-
-        # 计算新的图像维度
-        total_bytes = len(encrypted_data)
+    def __frame_shape(self, encrypted_length: int) -> Tuple[int, int, int]:
+        """容纳 encrypted_length 字节密文及帧尾的近似方形伪图像尺寸"""
+        total_bytes = encrypted_length + self.TRAILER_SIZE
         new_height = int(np.sqrt(total_bytes / 3)) + 1  # 确保有足够空间
         new_width = int(np.ceil(total_bytes / (new_height * 3)))
+        return new_height, new_width, 3
+
+    def encrypt_stream(self, chunks, shape, batch_blocks: int = 256):
+        """流式分块加密（'block' 模式），适用于无法一次性读入内存的图像
+
+        chunks: 可迭代的字节块（bytes / memoryview / ndarray 等），依次拼接即为按 C 顺序排列的像素数据
+        shape: 图像尺寸 (height, width) 或 (height, width, channels)
+        batch_blocks: 每批处理的块数，决定了单批的内存占用
+        Yields: 依次产出的密文字节块，拼接后即为完整密文（不含伪图像的填充与帧尾）
+        """
+        height, width = shape[:2]
+        channels = 1 if len(shape) == 2 else shape[2]
+        header = struct.pack('!III', height, width, channels)
 
-        # 填充数据至完整大小
-        padded_data = encrypted_data + b'\0' * (new_height * new_width * 3 - total_bytes)
+        # PKCS7 填充只依赖数据总长度，可以预先算出
+        pad_length = self.block_size - (len(header) + height * width * channels) % self.block_size
+        padding = bytes([pad_length] * pad_length) if pad_length < self.block_size else b''
 
-        # 重组为图像格式
-        encrypted = np.frombuffer(padded_data, dtype=np.uint8).reshape(new_height, new_width, 3)
+        source = itertools.chain([header], chunks, [padding])
+        bar = self.__stream_progress(-(-(len(header) + height * width * channels) // self.block_size))
+        try:
+            for batch in _rechunk(source, self.block_size, batch_blocks * self.block_size):
+                yield b''.join(self.__crypt_blocks(batch, self.key, self.block_size, 'encrypt', bar=bar))
+        finally:
+            if bar is not None:
+                bar.close()
+
+    def decrypt_stream(self, chunks, key: RSA.RsaKey, batch_blocks: int = 256, total_bytes: int = None):
+        """流式分块解密（'block' 模式），与 encrypt_stream 对应
+
+        chunks: 可迭代的密文字节块，拼接后须恰为完整密文
+        total_bytes: 可选，密文的总长度，只用于显示进度
+        Yields: 第一个产出值为图像尺寸 (height, width, channels)，之后依次为像素数据字节块
+        Raises: ValueError 密钥错误或密文无效
+        """
+        step = self.encrypted_block_size
+        expected_size = None
+        emitted = 0
+        bar = self.__stream_progress(None if total_bytes is None else total_bytes // step)
+        try:
+            for batch in _rechunk(chunks, step, batch_blocks * step):
+                plain = b''.join(self.__crypt_blocks(batch, key, step, 'decrypt', strict=True, bar=bar))
+                if expected_size is None:
+                    height, width, channels = struct.unpack('!III', plain[:12])
+                    expected_size = height * width * channels
+                    yield height, width, channels
+                    plain = plain[12:]
+                # 超出图像数据长度的部分即为 PKCS7 填充
+                plain = plain[:expected_size - emitted]
+                emitted += len(plain)
+                if plain:
+                    yield plain
+        finally:
+            if bar is not None:
+                bar.close()
+        if expected_size is None or emitted < expected_size:
+            raise ValueError("密文不完整")
+
+    def __cipher_length(self, data_size: int) -> int:
+        """data_size 字节的图像数据（不含信息头）加密后的密文长度"""
+        if self.mode == 'hybrid':
+            return self.encrypted_block_size + self.TAG_SIZE + 12 + data_size
+        return -(-(12 + data_size) // self.block_size) * self.encrypted_block_size
 
-        time_end = time.time()
-        print(f"Encryption time: {time_end - time_start:.2f}s")
+    @staticmethod
+    def __check_output(out, shape):
+        if out is None:
+            return np.empty(shape, dtype=np.uint8)
+        assert out.shape == shape and out.dtype == np.uint8 and out.flags.c_contiguous, \
+            f"输出数组须为 {shape} 的连续 uint8 数组"
+        return out
+
+    def encrypt_into(self, img: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """加密图像，直接写入预分配的伪图像，不拼接整幅图像的字节串
+
+        'block' 模式逐批写入各块的密文，'hybrid' 模式的 AES-GCM 直接在 out 的内存上加密。
+        out: 可选，形状与 uint8 类型须与加密结果一致，为 None 时自动分配
+        """
+        if img.dtype != np.uint8:
+            img = self.__preprocess_image(img)
+        img = np.ascontiguousarray(img)
+        out = self.__check_output(out, self.__frame_shape(self.__cipher_length(img.nbytes)))
+
+        view = memoryview(out).cast('B')
+        if self.mode == 'hybrid':
+            position = self.__hybrid_encrypt_into(img, view)
+        else:
+            position = 0
+            for encrypted in self.encrypt_stream([memoryview(img).cast('B')], img.shape):
+                view[position:position + len(encrypted)] = encrypted
+                position += len(encrypted)
+
+        # 填充零并在帧尾记录密文长度
+        out.reshape(-1)[position:len(view) - self.TRAILER_SIZE] = 0
+        view[len(view) - self.TRAILER_SIZE:] = struct.pack(self.TRAILER_FORMAT, self.TRAILER_MAGIC, position)
+        return out
+
+    def __hybrid_encrypt_into(self, img: np.ndarray, view: memoryview) -> int:
+        """混合加密：RSA-OAEP(会话密钥 | nonce | 密文长度) | GCM tag | AES-GCM 密文，
+        密文写入 view 的开头，返回密文长度"""
+        height, width = img.shape[:2]
+        channels = 1 if img.ndim == 2 else img.shape[2]
+        header = struct.pack('!III', height, width, channels)
+        length = len(header) + img.nbytes
+
+        session_key = get_random_bytes(self.SESSION_KEY_SIZE)
+        nonce = get_random_bytes(self.NONCE_SIZE)
+        cipher = AES.new(session_key, AES.MODE_GCM, nonce=nonce)
+        start = self.encrypted_block_size + self.TAG_SIZE
+        cipher.encrypt(header, output=view[start:start + len(header)])
+        cipher.encrypt(memoryview(img).cast('B'), output=view[start + len(header):start + length])
+        view[self.encrypted_block_size:start] = cipher.digest()
+
+        # 密文长度放在 RSA 块内，解密时据此去除末尾的零填充
+        envelope = session_key + nonce + struct.pack('!Q', length)
+        view[:self.encrypted_block_size] = self.__get_cipher(self.key).encrypt(envelope)
+        return start + length
+
+    def decrypt_into(self, img: np.ndarray, key: RSA.RsaKey, out: np.ndarray = None) -> np.ndarray:
+        """解密带帧尾的伪图像，直接读取输入的内存视图并写入预分配的输出
+
+        'hybrid' 模式的 AES-GCM 直接解密到 out 的内存上，认证失败时 out 中的内容无效。
+        out: 可选，形状须与原图一致，为 None 时自动分配
+        Raises: ValueError 帧格式不正确、密钥错误或密文无效
+        """
+        view = memoryview(np.ascontiguousarray(img)).cast('B')
+        if len(view) < self.TRAILER_SIZE:
+            raise ValueError("帧长度不足")
+        magic, length = struct.unpack(self.TRAILER_FORMAT, view[-self.TRAILER_SIZE:])
+        if magic != self.TRAILER_MAGIC or length > len(view) - self.TRAILER_SIZE:
+            raise ValueError("帧尾缺失或无效")
+        if self.mode == 'hybrid':
+            return self.__hybrid_decrypt_into(view[:length], key, out)
+
+        stream = self.decrypt_stream([view[:length]], key, total_bytes=length)
+        height, width, channels = next(stream)
+        out = self.__check_output(out, (height, width) if channels == 1 else (height, width, channels))
+
+        out_view = memoryview(out).cast('B')
+        position = 0
+        for plain in stream:
+            out_view[position:position + len(plain)] = plain
+            position += len(plain)
+        return out
+
+    def __hybrid_decrypt_into(self, data: memoryview, key: RSA.RsaKey, out: np.ndarray = None) -> np.ndarray:
+        """混合解密（格式见 __hybrid_encrypt_into），图像数据直接解密到 out"""
+        start = self.encrypted_block_size + self.TAG_SIZE
+        if len(data) < start + 12:
+            raise ValueError("密文不完整")
+        envelope = self.__get_cipher(key).decrypt(data[:self.encrypted_block_size])
+        session_key = envelope[:self.SESSION_KEY_SIZE]
+        nonce = envelope[self.SESSION_KEY_SIZE:self.SESSION_KEY_SIZE + self.NONCE_SIZE]
+        length, = struct.unpack('!Q', envelope[self.SESSION_KEY_SIZE + self.NONCE_SIZE:])
+        if start + length > len(data):
+            raise ValueError("密文不完整")
+
+        cipher = AES.new(session_key, AES.MODE_GCM, nonce=nonce)
+        height, width, channels = struct.unpack('!III', cipher.decrypt(data[start:start + 12]))
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        if height * width * channels != length - 12:
+            raise ValueError("密文中的图像尺寸无效")
+        out = self.__check_output(out, shape)
+        cipher.decrypt(data[start + 12:start + length], output=memoryview(out).cast('B'))
+        cipher.verify(data[self.encrypted_block_size:start])
+        return out
+
+    def _plan_processor(self, key, shape, dtype, decrypt):
+        """直接写入 out（见 encrypt_into / decrypt_into），cipher 对象在 prepare 时创建
+
+        RSA / OAEP 运算本身（pycryptodome）仍会为每个块分配字节串，'hybrid' 模式每张图像只有一个块。
+        """
+        assert dtype == np.uint8, f"RSACrypto 只支持 uint8 图像: {dtype}"
+        self.__get_cipher(key)
+        cipher_shape = self.__frame_shape(self.__cipher_length(int(np.prod(shape))))
+        if decrypt:
+            return (lambda img, out: self.decrypt_into(img, key, out)), cipher_shape
+        return self.encrypt_into, cipher_shape
 
-        return encrypted
+    def encrypt(self, img: np.ndarray) -> np.ndarray:
+        """加密图像"""
+        with self._measure('encrypt', img) as measurement:
+            with measurement.phase('cipher'):
+                return self.encrypt_into(img)
 
     def decrypt(self, img: np.ndarray, key: RSA.RsaKey) -> np.ndarray:
         """解密图像"""
-        time_start = time.time()
-
-        # 将图像转换为字节流
-        encrypted_data = img.tobytes()
-
-        # 解密
-        decrypted_data = self.__process_blocks(encrypted_data, key, 'decrypt')
-
+        with self._measure('decrypt', img) as measurement:
+            if self.mode == 'block':
+                try:
+                    with measurement.phase('cipher'):
+                        return self.decrypt_into(img, key)
+                except (ValueError, struct.error):
+                    pass  # 旧格式的帧或密钥错误，按原方式处理
+
+            with measurement.phase('setup'):
+                # 将图像转换为字节流
+                encrypted_data = img.tobytes()
+
+                # 帧尾记录了密文长度时只处理确切的密文部分；否则为旧格式，按原方式处理整帧
+                exact = False
+                if len(encrypted_data) >= self.TRAILER_SIZE:
+                    magic, length = struct.unpack(self.TRAILER_FORMAT, encrypted_data[-self.TRAILER_SIZE:])
+                    if magic == self.TRAILER_MAGIC and length <= len(encrypted_data) - self.TRAILER_SIZE:
+                        encrypted_data, exact = encrypted_data[:length], True
+
+            # 解密
+            with measurement.phase('cipher'):
+                if self.mode == 'hybrid':
+                    decrypted_data = self.__hybrid_decrypt(encrypted_data, key)
+                else:
+                    decrypted_data = self.__process_blocks(encrypted_data, key, exact=exact)
+
+            with measurement.phase('reassembly'):
+                return self.__reassemble(img, decrypted_data)
+
+    def __reassemble(self, img: np.ndarray, decrypted_data: bytes) -> np.ndarray:
+        """由解密后的字节流（图像信息头 + 像素数据）重组图像，解析失败时以 img 的尺寸作为备选"""
         # 使用默认值作为备选
         default_height, default_width = img.shape[:2]
         default_channels = 1 if len(img.shape) == 2 else img.shape[2]
@@ -138,12 +524,7 @@ class RSACrypto(BaseCrypto):
             # 如果重构图像失败，返回随机噪声图像
             decrypted = np.random.randint(0, 256, (height, width, channels), dtype=np.uint8)
 
-        decrypted = self.__preprocess_image(decrypted)
-
-        time_end = time.time()
-        print(f"Decryption time: {time_end - time_start:.2f}s")
-
-        return decrypted
+        return self.__preprocess_image(decrypted)
 
     @staticmethod
     def generate_keypair(key_size: int = 2048) -> Tuple[RSA.RsaKey, RSA.RsaKey]:
@@ -153,6 +534,8 @@ class RSACrypto(BaseCrypto):
 
 
 if __name__ == "__main__":
+    import cv2
+
     # 读取图像
     img = cv2.imread("../assets/hust.jpg")
 
@@ -1,5 +1,35 @@
-from .RSACrypto import RSACrypto
-from .ArnoldCatCrypto import ArnoldCatCrypto
-from .LogisticCrypto import LogisticCrypto
-from .LogisticKeyMixingCrypto import LogisticKeyMixingCrypto
+"""四种图像加密算法
 
+各算法模块在首次访问时才导入（模块级 __getattr__），只使用 ArnoldCatCrypto 的进程
+不会为 RSACrypto（pycryptodome）或 LogisticKeyMixingCrypto（numba）付出导入开销。
+"""
+import importlib
+from typing import TYPE_CHECKING
+
+# 对外导出的名字 -> 所在的子模块
+_LAZY_ATTRS = {
+    'RSACrypto': '.RSACrypto',
+    'ArnoldCatCrypto': '.ArnoldCatCrypto',
+    'LogisticCrypto': '.LogisticCrypto',
+    'LogisticKeyMixingCrypto': '.LogisticKeyMixingCrypto',
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+if TYPE_CHECKING:
+    from .RSACrypto import RSACrypto
+    from .ArnoldCatCrypto import ArnoldCatCrypto
+    from .LogisticCrypto import LogisticCrypto
+    from .LogisticKeyMixingCrypto import LogisticKeyMixingCrypto
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    globals()[name] = value  # 之后的访问不再经过 __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
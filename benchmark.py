@@ -0,0 +1,508 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import struct
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from Crypto.Cipher import PKCS1_OAEP
+from Crypto.PublicKey import RSA
+
+
+def benchmark_rsa_private_op(key_size=2048, rounds=50):
+    """RSA 私钥运算：同一套大数运算（内置 pow）下直接模幂与 CRT 分解（dp、dq、u 重组）的对比，
+    以及经公开接口 PKCS1_OAEP 解密一个块的端到端耗时
+
+    两种模幂使用相同的运算实现，比值只反映 CRT 本身的收益（理论上约 3~4 倍）；
+    pycryptodome 的大数运算由其自带的后端完成，端到端耗时单独列出，不与 pow 的结果相比。
+
+    返回 (直接模幂单次耗时, CRT 单次耗时, CRT 加速比, PKCS1_OAEP 解密一个块的耗时)
+    """
+    key = RSA.generate(key_size)
+    p, q, d, n = key.p, key.q, key.d, key.n
+    dp, dq, u = d % (p - 1), d % (q - 1), key.u  # pycryptodome 的 u 为 p 模 q 的逆元
+    message = 0x1234567890ABCDEF
+    ciphertext = pow(message, key.e, n)
+
+    def crt(c):
+        m1, m2 = pow(c, dp, p), pow(c, dq, q)
+        return m1 + (u * (m2 - m1) % q) * p
+
+    assert crt(ciphertext) == pow(ciphertext, d, n) == message, "CRT 重组的结果与直接模幂不一致"
+
+    time_start = time.perf_counter()
+    for _ in range(rounds):
+        pow(ciphertext, d, n)
+    plain_time = (time.perf_counter() - time_start) / rounds
+
+    time_start = time.perf_counter()
+    for _ in range(rounds):
+        crt(ciphertext)
+    crt_time = (time.perf_counter() - time_start) / rounds
+
+    cipher = PKCS1_OAEP.new(key)
+    block = cipher.encrypt(bytes(key.size_in_bytes() - 42))
+    time_start = time.perf_counter()
+    for _ in range(rounds):
+        cipher.decrypt(block)
+    oaep_time = (time.perf_counter() - time_start) / rounds
+
+    return plain_time, crt_time, plain_time / crt_time, oaep_time
+
+
+def benchmark_import_time(statement="import algorithms", rounds=10):
+    """在全新的解释器中测量一条导入语句的耗时（冷启动开销），返回多次测量的中位数（秒）"""
+    code = ("import time; start = time.perf_counter(); "
+            f"{statement}; "
+            "print(time.perf_counter() - start)")
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(rounds):
+        output = subprocess.run([sys.executable, "-c", code], cwd=cwd, check=True,
+                                capture_output=True, text=True).stdout
+        times.append(float(output.split()[-1]))
+    return statistics.median(times)
+
+
+IMPORT_STATEMENTS = {
+    "package": "import algorithms",
+    "ArnoldCat": "from algorithms import ArnoldCatCrypto",
+    "Logistic": "from algorithms import LogisticCrypto",
+    "Logistic KM": "from algorithms import LogisticKeyMixingCrypto",
+    "RSA": "from algorithms import RSACrypto",
+    "all": "from algorithms import *",
+}
+
+
+# 测试图像尺寸 (高, 宽)
+SIZES = {
+    "64": (64, 64),
+    "256": (256, 256),
+    "1024": (1024, 1024),
+    "4k": (2160, 3840),
+}
+QUICK_SIZES = ("64", "256")
+
+# RSA 逐块模式（及纯 Python 路径）在大图上耗时过长，超过该像素数的组合默认跳过
+RSA_BLOCK_MAX_PIXELS = 256 * 256
+
+
+def synthetic_image(shape, channels, seed=0):
+    """生成固定种子的随机测试图像，channels 为 1 时为灰度图，3 时为 BGR 彩色图"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, shape if channels == 1 else shape + (channels,), dtype=np.uint8)
+
+
+def benchmark_cases(rsa_key_sizes=(1024, 2048), rsa_max_pixels=RSA_BLOCK_MAX_PIXELS):
+    """全部测试组合：(算法名, 参数, 创建算法实例的函数, 解密密钥, 允许的最大像素数)"""
+    from algorithms import ArnoldCatCrypto, LogisticCrypto, LogisticKeyMixingCrypto, RSACrypto
+
+    for num_iter in (1, 20, 100):
+        key = (5, 7, num_iter)
+        yield "ArnoldCat", {"num_iter": num_iter}, lambda key=key: ArnoldCatCrypto(key), key, None
+    for rounds in (1, 3):
+        key = (3.99, 0.61, rounds)
+        yield "Logistic", {"rounds": rounds}, lambda key=key: LogisticCrypto(key), key, None
+    yield "LogisticKM", {}, lambda: LogisticKeyMixingCrypto("ILoveHUST"), "ILoveHUST", None
+    for key_size in rsa_key_sizes:
+        public_key, private_key = RSACrypto.generate_keypair(key_size)
+        for mode, max_pixels in (("block", rsa_max_pixels), ("hybrid", None)):
+            yield ("RSA", {"key_size": key_size, "mode": mode},
+                   lambda public_key=public_key, mode=mode: RSACrypto(public_key, mode=mode),
+                   private_key, max_pixels)
+
+
+def _time_call(func, repeat):
+    """预热一次（编译、缓存）后重复执行 repeat 次，再单独执行一次统计峰值内存（tracemalloc 会拖慢计时）"""
+    result = func()
+    times = []
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - time_start)
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, times, peak
+
+
+def _summary(case_id, name, params, shape, operation, times, peak):
+    median = statistics.median(times)
+    stdev = statistics.stdev(times) if len(times) > 1 else 0.0
+    pixels = shape[0] * shape[1]
+    return {
+        "id": case_id,
+        "algorithm": name,
+        "params": params,
+        "shape": list(shape),
+        "operation": operation,
+        "repeat": len(times),
+        "seconds_median": median,
+        "seconds_mean": statistics.mean(times),
+        "seconds_stdev": stdev,
+        "cv": stdev / median if median > 0 else 0.0,
+        "mpix_per_s": pixels / median / 1e6 if median > 0 else float("inf"),
+        "peak_bytes": peak,
+    }
+
+
+ALGORITHMS = ("ArnoldCat", "Logistic", "LogisticKM", "RSA")
+
+
+def run_suite(sizes=tuple(SIZES), channels=(1, 3), repeat=3, rsa_key_sizes=(1024, 2048),
+              rsa_max_pixels=RSA_BLOCK_MAX_PIXELS, algorithms=ALGORITHMS, verbose=True):
+    """运行全部算法 × 图像尺寸 × 通道数 × 密钥参数的组合，分别测量加密与解密
+
+    计时为预热之后的稳定状态（同一密钥、同一尺寸的置换/密钥流已在缓存中），
+    与批量处理同尺寸图像时的情形一致。
+    Returns: 可直接写入 JSON 的字典 {'meta': 运行环境, 'results': 每个组合的统计}
+    """
+    from algorithms.BaseCrypto import BaseCrypto
+    BaseCrypto.progress = False  # 关闭进度条，避免影响计时
+    BaseCrypto.instrument = None
+
+    results = []
+    if "RSA" not in algorithms:
+        rsa_key_sizes = ()
+    for name, params, factory, decrypt_key, max_pixels in benchmark_cases(rsa_key_sizes, rsa_max_pixels):
+        if name not in algorithms:
+            continue
+        crypto = factory()
+        for size in sizes:
+            shape = SIZES[size]
+            if max_pixels is not None and shape[0] * shape[1] > max_pixels:
+                continue
+            for channel in channels:
+                img = synthetic_image(shape, channel)
+                label = ",".join(f"{k}={v}" for k, v in params.items())
+                case_id = f"{name}[{label}]/{shape[0]}x{shape[1]}x{channel}"
+
+                encrypted, times, peak = _time_call(lambda: crypto.encrypt(img), repeat)
+                results.append(_summary(case_id + "/encrypt", name, params, img.shape, "encrypt", times, peak))
+                _, times, peak = _time_call(lambda: crypto.decrypt(encrypted, decrypt_key), repeat)
+                results.append(_summary(case_id + "/decrypt", name, params, img.shape, "decrypt", times, peak))
+
+                if verbose:
+                    for result in results[-2:]:
+                        print(f"{result['id']:<55} {result['seconds_median'] * 1000:10.2f}ms "
+                              f"±{result['cv'] * 100:5.1f}%  {result['mpix_per_s']:9.2f} MP/s  "
+                              f"peak {result['peak_bytes'] / 2 ** 20:8.1f} MiB")
+
+    meta = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": repeat,
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare_with_baseline(report, baseline, threshold=0.2, min_delta=0.5e-3):
+    """与基线报告比较，中位耗时比基线慢 threshold（比例）以上的组合视为性能退化
+
+    min_delta: 绝对差值低于该值（秒）时忽略，避免亚毫秒级组合的计时噪声被误报
+
+    Returns: [(id, 基线耗时, 当前耗时, 比值)]，按比值从大到小排序
+    """
+    baseline_times = {result["id"]: result["seconds_median"] for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        before = baseline_times.get(result["id"])
+        after = result["seconds_median"]
+        if before and after > before * (1 + threshold) and after - before >= min_delta:
+            regressions.append((result["id"], before, after, after / before))
+    return sorted(regressions, key=lambda item: item[3], reverse=True)
+
+
+# 异步负载测试中请求与响应的帧头：图像的 高、宽、通道数，之后为原始像素字节
+_FRAME_HEADER = struct.Struct(">III")
+
+
+async def _read_image(reader):
+    height, width, channels = _FRAME_HEADER.unpack(await reader.readexactly(_FRAME_HEADER.size))
+    data = await reader.readexactly(height * width * channels)
+    shape = (height, width) if channels == 1 else (height, width, channels)
+    return np.frombuffer(data, dtype=np.uint8).reshape(shape)
+
+
+def _write_image(writer, img):
+    channels = img.shape[2] if img.ndim == 3 else 1
+    writer.write(_FRAME_HEADER.pack(img.shape[0], img.shape[1], channels))
+    writer.write(np.ascontiguousarray(img).tobytes())
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+    p50, p99 = np.percentile(values, (50, 99))
+    return {"p50": float(p50), "p99": float(p99), "max": float(max(values))}
+
+
+async def _serve_load(crypto, handler, img, clients, requests, probe_interval):
+    """启动本地的图像加密服务（asyncio TCP 服务器，模拟接收图像的服务），由 clients 个并发客户端
+    各发送 requests 张图像，同时以 probe_interval 为周期测量事件循环的延迟（sleep 的超时量）
+
+    handler: 'idle' -> 不发送请求，只测量空闲时的延迟
+             'sync' -> 在事件循环中直接调用 encrypt（阻塞事件循环）
+             'async' -> await encrypt_async（在执行器中运行）
+    """
+    import asyncio
+
+    async def handle(reader, writer):
+        handlers.append(asyncio.current_task())
+        try:
+            while True:
+                try:
+                    image = await _read_image(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                if handler == "sync":
+                    encrypted = crypto.encrypt(image)
+                else:
+                    encrypted = await crypto.encrypt_async(image)
+                _write_image(writer, encrypted)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def client(latencies):
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+        for _ in range(requests):
+            time_start = time.perf_counter()
+            _write_image(writer, img)
+            await writer.drain()
+            await _read_image(reader)
+            latencies.append(time.perf_counter() - time_start)
+        writer.close()
+        await writer.wait_closed()
+
+    async def probe(lags, done):
+        loop = asyncio.get_running_loop()
+        while not done.is_set():
+            time_start = loop.time()
+            await asyncio.sleep(probe_interval)
+            lags.append(max(loop.time() - time_start - probe_interval, 0.0))
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    lags, latencies, handlers, done = [], [], [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, done))
+    time_start = time.perf_counter()
+    async with server:
+        if handler == "idle":
+            await asyncio.sleep(probe_interval * 200)
+        else:
+            await asyncio.gather(*(client(latencies) for _ in range(clients)))
+            await asyncio.gather(*handlers)  # 等服务端读到各连接的 EOF 后再关闭服务器
+        elapsed = time.perf_counter() - time_start
+        done.set()
+        await probe_task
+    return {
+        "handler": handler,
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "requests_per_s": len(latencies) / elapsed if latencies else 0.0,
+        "loop_lag": _percentiles(lags),
+        "request_latency": _percentiles(latencies),
+    }
+
+
+def benchmark_async_server(algorithm="Logistic", shape=(512, 512), channels=3, clients=8, requests=4,
+                           limit=None, executor="thread", workers=None, probe_interval=0.005):
+    """异步接口的负载测试：对比在事件循环中直接调用 encrypt 与使用 encrypt_async 时事件循环的延迟
+
+    encrypt_async 在执行器中运行加密，事件循环的延迟应与空闲时基本相同，不随负载增加；
+    直接调用 encrypt 时每个请求都会使事件循环停顿一次完整的加密时间。
+    Returns: [空闲, 同步处理, 异步处理] 三种情形的统计
+    """
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from algorithms.BaseCrypto import BaseCrypto
+    BaseCrypto.progress = False
+    BaseCrypto.instrument = None
+
+    for name, _, factory, _, _ in benchmark_cases(rsa_key_sizes=(2048,)):
+        if name == algorithm:
+            crypto = factory()
+            break
+    else:
+        raise ValueError(f"不支持的算法: {algorithm}")
+    crypto.async_limit = limit
+    img = synthetic_image(shape, channels)
+    crypto.encrypt(img)  # 预热：置换索引、密钥流等进入缓存，numba 内核完成编译
+
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    with pool_class(workers) as pool:
+        # 进程池按需 fork 工作进程，在事件循环运行期间（已有其他线程）fork 可能死锁，先启动全部工作进程
+        list(pool.map(int, range(workers)))
+        crypto.async_executor = pool
+        return [asyncio.run(_serve_load(crypto, handler, img, clients, requests, probe_interval))
+                for handler in ("idle", "sync", "async")]
+
+
+def _default_worker_counts():
+    """1, 2, 4, ... 直到 CPU 核数（含核数本身）"""
+    cpu_count = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 < cpu_count:
+        counts.append(counts[-1] * 2)
+    if cpu_count > 1:
+        counts.append(cpu_count)
+    return counts
+
+
+def benchmark_rsa_workers(shape=(256, 256), channels=1, key_size=2048, workers=None,
+                          executors=("process", "thread"), repeat=3, verbose=True):
+    """RSA 逐块模式的吞吐量随 worker 数与执行器类型的变化
+
+    每种组合使用独立的实例，预热一次（启动执行器、进程接收密钥）后计时；
+    加速比相对于 workers=1（当前线程中顺序处理）。
+    Returns: [{'executor', 'workers', 'operation', 'seconds_median', 'mpix_per_s', 'speedup'}]
+    """
+    from algorithms import RSACrypto
+    from algorithms.BaseCrypto import BaseCrypto
+    BaseCrypto.progress = False
+    BaseCrypto.instrument = None
+
+    public_key, private_key = RSACrypto.generate_keypair(key_size)
+    img = synthetic_image(shape, channels)
+    pixels = shape[0] * shape[1]
+    # workers=1 不使用执行器，只测一次作为基准
+    configs = [("serial", 1)] + [(executor, count) for executor in executors
+                                 for count in (workers or _default_worker_counts()) if count > 1]
+    results = []
+    baseline = {}
+    for executor, count in configs:
+        with RSACrypto(public_key, workers=count, executor="process" if executor == "serial" else executor) \
+                as crypto:
+            encrypted = crypto.encrypt(img)
+            crypto.decrypt(encrypted, private_key)
+            encrypt_times, decrypt_times = [], []
+            for _ in range(repeat):
+                time_start = time.perf_counter()
+                crypto.encrypt(img)
+                encrypt_times.append(time.perf_counter() - time_start)
+                time_start = time.perf_counter()
+                crypto.decrypt(encrypted, private_key)
+                decrypt_times.append(time.perf_counter() - time_start)
+        for operation, times in (("encrypt", encrypt_times), ("decrypt", decrypt_times)):
+            median = statistics.median(times)
+            baseline.setdefault(operation, median)
+            results.append({
+                "executor": executor,
+                "workers": count,
+                "operation": operation,
+                "seconds_median": median,
+                "mpix_per_s": pixels / median / 1e6,
+                "speedup": baseline[operation] / median,
+            })
+            if verbose:
+                print(f"{executor:<7} workers={count:<3} {operation:<7} {median * 1000:10.1f}ms  "
+                      f"{pixels / median / 1e6:8.4f} MP/s  speedup {baseline[operation] / median:5.2f}x")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="图像加密算法性能测试")
+    subparsers = parser.add_subparsers(dest="command")
+
+    suite = subparsers.add_parser("suite", help="四种算法在不同尺寸、通道数与密钥参数下的吞吐量（默认）")
+    suite.add_argument("--algorithms", nargs="+", choices=ALGORITHMS, default=list(ALGORITHMS))
+    suite.add_argument("--sizes", nargs="+", choices=list(SIZES), default=None)
+    suite.add_argument("--channels", nargs="+", type=int, choices=(1, 3), default=[1, 3])
+    suite.add_argument("--repeat", type=int, default=3)
+    suite.add_argument("--rsa-key-sizes", nargs="+", type=int, default=[1024, 2048])
+    suite.add_argument("--rsa-max-pixels", type=int, default=RSA_BLOCK_MAX_PIXELS,
+                       help="RSA 逐块模式允许的最大像素数")
+    suite.add_argument("--quick", action="store_true", help=f"只测试 {', '.join(QUICK_SIZES)} 尺寸")
+    suite.add_argument("--json", help="将结果写入 JSON 文件")
+    suite.add_argument("--baseline", help="基线 JSON 文件，用于检查性能退化")
+    suite.add_argument("--threshold", type=float, default=0.2, help="判定为退化的相对变慢比例")
+    suite.add_argument("--min-delta", type=float, default=0.5e-3, help="忽略绝对差值低于该值（秒）的变化")
+
+    load = subparsers.add_parser("async", help="异步接口的负载测试：本地服务器在负载下的事件循环延迟")
+    load.add_argument("--algorithm", choices=ALGORITHMS, default="Logistic")
+    load.add_argument("--size", type=int, nargs=2, default=[512, 512], metavar=("H", "W"))
+    load.add_argument("--channels", type=int, choices=(1, 3), default=3)
+    load.add_argument("--clients", type=int, default=8, help="并发客户端数")
+    load.add_argument("--requests", type=int, default=4, help="每个客户端发送的图像数")
+    load.add_argument("--limit", type=int, default=None, help="同时执行的加密任务数上限（async_limit）")
+    load.add_argument("--executor", choices=("thread", "process"), default="thread")
+    load.add_argument("--workers", type=int, default=None, help="执行器的线程 / 进程数")
+
+    subparsers.add_parser("import", help="冷启动导入耗时")
+    subparsers.add_parser("rsa-crt", help="RSA 私钥运算：直接模幂与 CRT 的对比，以及 PKCS1_OAEP 的端到端耗时")
+
+    rsa_workers = subparsers.add_parser("rsa-workers", help="RSA 逐块模式的吞吐量随 worker 数与执行器的变化")
+    rsa_workers.add_argument("--size", type=int, nargs=2, default=[256, 256], metavar=("H", "W"))
+    rsa_workers.add_argument("--channels", type=int, choices=(1, 3), default=1)
+    rsa_workers.add_argument("--key-size", type=int, default=2048)
+    rsa_workers.add_argument("--workers", type=int, nargs="+", default=None,
+                             help="要测试的 worker 数，默认为 1, 2, 4, ... 直到 CPU 核数")
+    rsa_workers.add_argument("--executors", nargs="+", choices=("process", "thread"),
+                             default=["process", "thread"])
+    rsa_workers.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args(argv)
+    if args.command == "import":
+        for name, statement in IMPORT_STATEMENTS.items():
+            print(f"Import time ({name}): {benchmark_import_time(statement) * 1000:.1f}ms")
+        return 0
+    if args.command == "async":
+        results = benchmark_async_server(args.algorithm, tuple(args.size), args.channels, args.clients,
+                                         args.requests, args.limit, args.executor, args.workers)
+        for result in results:
+            lag, latency = result["loop_lag"], result["request_latency"]
+            print(f"{result['handler']:<6} loop lag p50 {lag['p50'] * 1000:7.2f}ms  p99 {lag['p99'] * 1000:7.2f}ms  "
+                  f"max {lag['max'] * 1000:7.2f}ms | {result['requests']:3d} requests "
+                  f"{result['requests_per_s']:6.1f}/s  latency p50 {latency['p50'] * 1000:7.1f}ms")
+        return 0
+    if args.command == "rsa-crt":
+        plain_time, crt_time, speedup, oaep_time = benchmark_rsa_private_op()
+        print(f"RSA private op (pow, full):   {plain_time * 1000:.2f}ms")
+        print(f"RSA private op (pow, CRT):    {crt_time * 1000:.2f}ms")
+        print(f"CRT speedup: {speedup:.2f}x")
+        print(f"PKCS1_OAEP decrypt per block: {oaep_time * 1000:.2f}ms")
+        return 0
+
+    if args.command == "rsa-workers":
+        benchmark_rsa_workers(tuple(args.size), args.channels, args.key_size, args.workers, args.executors,
+                              args.repeat)
+        return 0
+
+    if args.command is None:
+        args = parser.parse_args(["suite"] + (argv or []))
+    sizes = args.sizes or (QUICK_SIZES if args.quick else tuple(SIZES))
+    report = run_suite(sizes, args.channels, args.repeat, args.rsa_key_sizes, args.rsa_max_pixels,
+                       args.algorithms)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare_with_baseline(report, json.load(file), args.threshold, args.min_delta)
+        for case_id, before, after, ratio in regressions:
+            print(f"REGRESSION {case_id}: {before * 1000:.2f}ms -> {after * 1000:.2f}ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
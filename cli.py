@@ -0,0 +1,409 @@
+"""批量加解密命令行工具
+
+对目录树或文件列表中的全部图像进行加密或解密，处理过程为三级流水线，各级之间以有界队列连接：
+
+    读取线程（cv2.imread / 打开容器文件） -> 加解密（进程池，见 BaseCrypto.encrypt_many） -> 写出线程
+
+图像解码、加解密与编码 / 写文件相互重叠；队列有界，内存占用不随文件数增长。
+输出先写入临时文件再原子地重命名，中断后使用 --skip-existing 重新运行即可从断点继续。
+
+用法：
+    python cli.py encrypt -a ArnoldCat -k 5,7,20 assets/ -o out/
+    python cli.py decrypt -a ArnoldCat -k 5,7,20 out/ -o restored/ --skip-existing
+    python cli.py encrypt -a RSA -k public.pem --rsa-mode hybrid a.jpg b.jpg -o out/ --workers 4
+    python cli.py keygen private.pem public.pem
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from algorithms import ArnoldCatCrypto, LogisticCrypto, LogisticKeyMixingCrypto, RSACrypto
+from algorithms.BaseCrypto import BaseCrypto
+from algorithms.CryptoContainer import CryptoContainer
+
+ALGORITHMS = ("ArnoldCat", "Logistic", "LogisticKM", "RSA")
+IMAGE_EXTENSIONS = (".bmp", ".jpg", ".jpeg", ".png", ".tif", ".tiff", ".webp")
+CONTAINER_EXTENSION = ".imgc"
+
+
+def create_crypto(algorithm, key, decrypt=False, arnold_mode="pad", rsa_mode="block"):
+    """根据命令行参数创建算法实例，返回 (算法实例, 解密密钥)
+
+    key: ArnoldCat 为 "a,b,n"，Logistic 为 "r,x0,n"，LogisticKM 为任意字符串，
+         RSA 为 PEM 密钥文件路径（加密时可以是公钥或私钥，解密时必须是私钥）
+    """
+    if algorithm == "ArnoldCat":
+        key = tuple(int(value) for value in key.split(","))
+        assert len(key) == 3, "ArnoldCat 的密钥格式为 a,b,n"
+        return ArnoldCatCrypto(key, mode=arnold_mode), key
+    if algorithm == "Logistic":
+        r, x0, rounds = key.split(",")
+        key = (float(r), float(x0), int(rounds))
+        return LogisticCrypto(key), key
+    if algorithm == "LogisticKM":
+        return LogisticKeyMixingCrypto(key), key
+    if algorithm == "RSA":
+        from Crypto.PublicKey import RSA
+        with open(key, "rb") as file:
+            key = RSA.import_key(file.read())
+        if decrypt:
+            assert key.has_private(), "RSA 解密需要私钥"
+            return RSACrypto(key.publickey(), mode=rsa_mode), key
+        return RSACrypto(key.publickey(), mode=rsa_mode), None
+    raise ValueError(f"不支持的算法: {algorithm}")
+
+
+def output_path(relative, decrypt, fmt, ext):
+    """输入文件的相对路径 -> 输出文件的相对路径"""
+    if not decrypt:
+        return relative.with_suffix(CONTAINER_EXTENSION if fmt == "container" else ".png")
+    return relative.with_suffix(ext)
+
+
+def collect_tasks(inputs, output_dir, decrypt=False, fmt="container", ext=".png"):
+    """展开输入的目录与文件，返回 [(输入路径, 输出路径)]
+
+    目录按相对路径保留结构，单个文件直接放在输出目录下；以 '.' 开头的文件（含未完成的临时文件）被忽略。
+    """
+    if not decrypt:
+        extensions = IMAGE_EXTENSIONS
+    else:
+        extensions = (CONTAINER_EXTENSION,) if fmt == "container" else (".png",)
+
+    tasks = []
+    for item in map(Path, inputs):
+        if item.is_dir():
+            files = sorted(path for path in item.rglob("*")
+                           if path.is_file() and path.suffix.lower() in extensions and not path.name.startswith("."))
+            tasks.extend((path, output_dir / output_path(path.relative_to(item), decrypt, fmt, ext))
+                         for path in files)
+        elif item.is_file():
+            tasks.append((item, output_dir / output_path(Path(item.name), decrypt, fmt, ext)))
+        else:
+            raise FileNotFoundError(f"输入不存在: {item}")
+
+    seen = {}
+    for source, target in tasks:
+        if target in seen:
+            raise ValueError(f"{seen[target]} 与 {source} 的输出路径相同: {target}")
+        seen[target] = source
+    return tasks
+
+
+def _partial_path(path):
+    """写出时使用的临时文件名：与目标文件同目录（保证 os.replace 是原子的），保留扩展名供 cv2.imwrite 识别格式"""
+    return path.with_name(f".{path.stem}.partial{path.suffix}")
+
+
+class StageStats:
+    """流水线中一级的统计：处理的文件数、字节数与各线程累计的忙碌时间"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.bytes = 0
+        self.pixels = 0
+        self.busy = 0.0
+        self.__lock = threading.Lock()
+
+    def add(self, seconds, nbytes=0, pixels=0):
+        with self.__lock:
+            self.count += 1
+            self.bytes += nbytes
+            self.pixels += pixels
+            self.busy += seconds
+
+    def report(self):
+        text = f"{self.name:<7} {self.count:6d} files {self.bytes / 2 ** 20:10.1f} MiB  busy {self.busy:8.2f}s"
+        if self.busy > 0:
+            text += f"  {self.bytes / 2 ** 20 / self.busy:8.1f} MiB/s"
+            if self.pixels:
+                text += f"  {self.pixels / 1e6 / self.busy:8.2f} MP/s"
+        return text
+
+
+class _Item:
+    """在流水线中传递的一个文件"""
+    __slots__ = ("source", "target", "data", "shape", "dtype")
+
+    def __init__(self, source, target, data, shape=None, dtype=None):
+        self.source, self.target, self.data = source, target, data
+        self.shape, self.dtype = shape, dtype
+
+
+class Pipeline:
+    """读取 -> 加解密 -> 写出 的三级流水线
+
+    readers / writers: 读取与写出的线程数（cv2 的编解码与文件 I/O 会释放 GIL）
+    workers: 加解密的进程数，1 表示在主线程中处理
+    queue_size: 各级之间队列的容量，同时也是进程池中同时处理的图像数上限
+    """
+
+    def __init__(self, crypto, key=None, decrypt=False, fmt="container", workers=1, readers=2, writers=2,
+                 queue_size=8, progress=True):
+        self.crypto, self.key, self.decrypt, self.fmt = crypto, key, decrypt, fmt
+        self.workers, self.readers, self.writers = workers, readers, writers
+        self.queue_size = queue_size
+        self.progress = progress
+        self.read_stats, self.crypt_stats, self.write_stats = \
+            StageStats("read"), StageStats("crypt"), StageStats("write")
+        self.input_wait = 0.0    # 加解密等待读取线程的时间：读取是瓶颈
+        self.output_wait = 0.0   # 加解密等待写出队列的时间：写出是瓶颈
+        self.failures = []
+        self.__failure_lock = threading.Lock()
+        self.__stop = threading.Event()
+
+    def __fail(self, path, error):
+        with self.__failure_lock:
+            self.failures.append((path, f"{type(error).__name__}: {error}"))
+
+    def __put(self, q, item):
+        """向有界队列放入 item；流水线中止时放弃，避免线程阻塞在已无人消费的队列上"""
+        while not self.__stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __read(self, item):
+        if not self.decrypt:
+            # 8 位灰度图保持单通道，其余读取为 8 位 BGR（与各算法的 __main__ 示例一致）
+            img = cv2.imread(str(item.source), cv2.IMREAD_ANYCOLOR)
+            if img is None:
+                raise ValueError("无法读取图像")
+            item.data, item.shape, item.dtype = img, img.shape, img.dtype
+        elif self.fmt == "container":
+            container = CryptoContainer(item.source)
+            container.check(self.crypto, self.key)
+            if container.tiled:
+                raise ValueError("分块布局的容器请使用 decrypt_file 解密")
+            item.data = np.array(container.read_cipher())
+            item.shape, item.dtype = container.shape, np.dtype(container.meta["dtype"])
+        else:
+            item.data = cv2.imread(str(item.source), cv2.IMREAD_UNCHANGED)
+            if item.data is None:
+                raise ValueError("无法读取图像")
+
+    def __reader(self, tasks, read_queue, bar):
+        try:
+            while not self.__stop.is_set():
+                try:
+                    source, target = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                item = _Item(source, target, None)
+                time_start = time.perf_counter()
+                try:
+                    self.__read(item)
+                except Exception as error:
+                    self.__fail(source, error)
+                    if bar is not None:
+                        bar.update(1)
+                    continue
+                self.read_stats.add(time.perf_counter() - time_start, os.path.getsize(source))
+                if not self.__put(read_queue, item):
+                    return
+        finally:
+            self.__put(read_queue, None)
+
+    def __write(self, item, result):
+        target = item.target
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = _partial_path(target)
+        try:
+            if not self.decrypt and self.fmt == "container":
+                CryptoContainer.write_cipher(partial, self.crypto, item.shape, item.dtype, result)
+            else:
+                if self.decrypt and item.shape is not None:
+                    # 解密容器：裁剪回原图尺寸（ArnoldCat 'pad' 模式会补零为方形）
+                    height, width = item.shape[:2]
+                    result = result[:height, :width].reshape(item.shape).astype(item.dtype, copy=False)
+                if not cv2.imwrite(str(partial), result):
+                    raise ValueError(f"无法写出图像，形状 {result.shape}、类型 {result.dtype}")
+            os.replace(partial, target)
+        except BaseException:
+            if partial.exists():
+                partial.unlink()
+            raise
+        return os.path.getsize(target)
+
+    def __writer(self, write_queue, bar):
+        while True:
+            entry = write_queue.get()
+            if entry is None:
+                return
+            item, result = entry
+            time_start = time.perf_counter()
+            try:
+                nbytes = self.__write(item, result)
+            except Exception as error:
+                self.__fail(item.source, error)
+            else:
+                self.write_stats.add(time.perf_counter() - time_start, nbytes)
+            if bar is not None:
+                bar.update(1)
+
+    def __inputs(self, read_queue, pending):
+        """从读取队列取出图像交给 encrypt_many / decrypt_many，并按顺序记录对应的文件"""
+        finished = 0
+        while finished < self.readers:
+            time_start = time.perf_counter()
+            item = read_queue.get()
+            self.input_wait += time.perf_counter() - time_start
+            if item is None:
+                finished += 1
+                continue
+            pending.append(item)
+            yield item.data
+
+    def run(self, tasks):
+        """处理全部 (输入路径, 输出路径)；单个文件的读写与加解密错误记录在 self.failures 中，不中断其余文件"""
+        task_queue = queue.Queue()
+        for task in tasks:
+            task_queue.put(task)
+        read_queue = queue.Queue(self.queue_size)
+        write_queue = queue.Queue(self.queue_size)
+
+        bar = None
+        if self.progress:
+            from tqdm.auto import tqdm
+            bar = tqdm(total=len(tasks), unit="file")
+
+        # 进程池必须在读写线程启动之前创建并启动工作进程：有其他线程时 fork 可能死锁
+        executor = None
+        if self.workers > 1:
+            executor = self.crypto.batch_executor(self.workers, self.key if self.decrypt else None, self.decrypt)
+
+        readers = [threading.Thread(target=self.__reader, args=(task_queue, read_queue, bar), daemon=True)
+                   for _ in range(self.readers)]
+        writers = [threading.Thread(target=self.__writer, args=(write_queue, bar), daemon=True)
+                   for _ in range(self.writers)]
+        for thread in readers + writers:
+            thread.start()
+
+        pending = deque()
+        inputs = self.__inputs(read_queue, pending)
+        if self.decrypt:
+            results = self.crypto.decrypt_many(inputs, self.key, self.workers, self.queue_size, executor,
+                                               return_exceptions=True)
+        else:
+            results = self.crypto.encrypt_many(inputs, self.workers, self.queue_size, executor,
+                                               return_exceptions=True)
+
+        try:
+            while True:
+                input_wait = self.input_wait
+                time_start = time.perf_counter()
+                result = next(results, None)
+                if result is None:
+                    break
+                item = pending.popleft()
+                if isinstance(result, Exception):
+                    self.__fail(item.source, result)
+                    if bar is not None:
+                        bar.update(1)
+                    continue
+                # 扣除等待读取线程的时间，剩余为加解密本身（多进程时为主线程等待结果）的时间
+                seconds = time.perf_counter() - time_start - (self.input_wait - input_wait)
+                self.crypt_stats.add(seconds, item.data.nbytes, item.data.shape[0] * item.data.shape[1])
+                item.data = None
+
+                time_start = time.perf_counter()
+                write_queue.put((item, result))
+                self.output_wait += time.perf_counter() - time_start
+        finally:
+            # 正常结束时读取线程均已退出；加解密出错时通知读取线程停止
+            self.__stop.set()
+            for _ in writers:
+                write_queue.put(None)
+            for thread in writers:
+                thread.join()
+            results.close()
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if bar is not None:
+                bar.close()
+
+    def report(self, elapsed, skipped=0):
+        lines = [stats.report() for stats in (self.read_stats, self.crypt_stats, self.write_stats)]
+        lines.append(f"crypt waited {self.input_wait:.2f}s for input, {self.output_wait:.2f}s for output")
+        done = self.write_stats.count
+        lines.append(f"total   {done} done, {skipped} skipped, {len(self.failures)} failed in {elapsed:.2f}s "
+                     f"({done / elapsed if elapsed > 0 else 0:.1f} files/s)")
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量加密 / 解密目录树或文件列表中的图像")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command in ("encrypt", "decrypt"):
+        sub = subparsers.add_parser(command, help="加密图像" if command == "encrypt" else "解密图像")
+        sub.add_argument("inputs", nargs="+", help="输入的目录或文件，目录会被递归遍历")
+        sub.add_argument("-o", "--output", required=True, help="输出目录，保留输入目录的结构")
+        sub.add_argument("-a", "--algorithm", choices=ALGORITHMS, required=True)
+        sub.add_argument("-k", "--key", required=True,
+                         help="ArnoldCat: a,b,n；Logistic: r,x0,n；LogisticKM: 字符串；RSA: PEM 密钥文件")
+        sub.add_argument("--format", choices=("container", "png"), default="container",
+                         help="密文格式：container 为自描述的容器文件（.imgc），png 为旧的 PNG 密文图像")
+        sub.add_argument("--arnold-mode", choices=("pad", "native"), default="pad")
+        sub.add_argument("--rsa-mode", choices=("block", "hybrid"), default="block")
+        sub.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="加解密进程数")
+        sub.add_argument("--readers", type=int, default=2, help="读取线程数")
+        sub.add_argument("--writers", type=int, default=2, help="写出线程数")
+        sub.add_argument("--queue-size", type=int, default=8, help="流水线各级之间队列的容量")
+        sub.add_argument("--skip-existing", action="store_true", help="跳过输出已存在的文件（断点续传）")
+        sub.add_argument("--quiet", action="store_true", help="不显示进度条")
+        if command == "decrypt":
+            sub.add_argument("--ext", default=".png", help="解密结果的图像格式（扩展名），默认无损的 .png")
+
+    keygen = subparsers.add_parser("keygen", help="生成 RSA 密钥对（PEM 格式）")
+    keygen.add_argument("private_key")
+    keygen.add_argument("public_key")
+    keygen.add_argument("--bits", type=int, default=2048)
+
+    args = parser.parse_args(argv)
+    if args.command == "keygen":
+        public_key, private_key = RSACrypto.generate_keypair(args.bits)
+        with open(args.private_key, "wb") as file:
+            file.write(private_key.export_key())
+        with open(args.public_key, "wb") as file:
+            file.write(public_key.export_key())
+        return 0
+
+    decrypt = args.command == "decrypt"
+    assert args.workers >= 1 and args.readers >= 1 and args.writers >= 1, "进程数与线程数至少为 1"
+    crypto, key = create_crypto(args.algorithm, args.key, decrypt, args.arnold_mode, args.rsa_mode)
+    BaseCrypto.progress = False  # 单张图像内部的进度条与整体进度条冲突
+
+    tasks = collect_tasks(args.inputs, Path(args.output), decrypt, args.format, getattr(args, "ext", ".png"))
+    skipped = 0
+    if args.skip_existing:
+        remaining = [(source, target) for source, target in tasks if not target.exists()]
+        skipped = len(tasks) - len(remaining)
+        tasks = remaining
+
+    pipeline = Pipeline(crypto, key, decrypt, args.format, args.workers, args.readers, args.writers,
+                        args.queue_size, progress=not args.quiet)
+    time_start = time.perf_counter()
+    pipeline.run(tasks)
+    elapsed = time.perf_counter() - time_start
+
+    for path, message in pipeline.failures:
+        print(f"FAIL {path}: {message}", file=sys.stderr)
+    print(pipeline.report(elapsed, skipped))
+    return 1 if pipeline.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,17 @@
 import numpy as np
 import cv2
 from PIL import Image
-from matplotlib import pyplot as plt
+
+
+# 数值指标只依赖 numpy；绘图函数在调用时才导入 matplotlib，批量计算指标时无需加载
+def _pyplot():
+    from matplotlib import pyplot as plt
+    return plt
 
 
 def imshow(*imgs, titles=None):
     # 在 jupyter notebook 里并排展示多张图片
+    plt = _pyplot()
     plt.figure(figsize=(4 * len(imgs), 4), facecolor='none')
 
     if titles is None:
@@ -28,6 +34,7 @@ def draw_intensity_histogram(img_ori, img_enc, is_gray=False):
     img_enc: 加密后的图像
     is_gray: 是否为灰度图
     """
+    plt = _pyplot()
     plt.figure(figsize=(12, 5))
 
     # 左侧子图：原图
@@ -82,47 +89,133 @@ def get_image_matrix_gray(img):
         image_matrix.append(row)
     return image_matrix, image_size
 
-def draw_adjacent_pixel_auto_correlation(img_ori, img_enc):
+def draw_adjacent_pixel_auto_correlation(img_ori, img_enc, samples=1024, direction='horizontal'):
     """
-    绘制图像的 adjacent pixel auto-correlation 指标曲线
+    绘制图像的 adjacent pixel auto-correlation 指标曲线（随机采样的相邻像素散点图）
     img_ori: 原图
     img_enc: 加密后的图像
+    samples: 采样点数
+    direction: 相邻方向，'horizontal' / 'vertical' / 'diagonal'
     """
+    plt = _pyplot()
     plt.figure(figsize=(12, 5))
 
-    image_ori, image_size = get_image_matrix_gray(img_ori)
-    image_enc, _ = get_image_matrix_gray(img_enc)
-
-    # 采样点
-    samples_x_ori = []
-    samples_y_ori = []
-    samples_x_enc = []
-    samples_y_enc = []
-
-    # 随机采样
-    for i in range(1024):
-        x = np.random.randint(0, image_size[0] - 2)
-        y = np.random.randint(0, image_size[1] - 1)
-        # 原图采样点
-        samples_x_ori.append(image_ori[x][y])
-        samples_y_ori.append(image_ori[x + 1][y])
-        # 加密图采样点
-        samples_x_enc.append(image_enc[x][y])
-        samples_y_enc.append(image_enc[x + 1][y])
+    rng = np.random.default_rng()
+    for i, (img, title) in enumerate([(img_ori, 'Original Image'), (img_enc, 'Encrypted Image')], 1):
+        # 在全部相邻像素对中随机采样
+        x, y = adjacent_pixel_pairs(to_gray(img), direction)
+        index = rng.integers(0, len(x), samples)
+        plt.subplot(1, 2, i)
+        plt.scatter(x[index], y[index], s=2)
+        plt.title(title, fontsize=20)
+        plt.xlabel('Pixel Value', fontsize=16)
+        plt.ylabel('Adjacent Pixel Value', fontsize=16)
 
-    # 左侧子图：原图
-    plt.subplot(1, 2, 1)
-    plt.scatter(samples_x_ori, samples_y_ori, s=2)
-    plt.title('Original Image', fontsize=20)
-    plt.xlabel('Pixel Value', fontsize=16)
-    plt.ylabel('Adjacent Pixel Value', fontsize=16)
+    plt.tight_layout()
+    plt.show()
 
-    # 右侧子图：加密图
-    plt.subplot(1, 2, 2)
-    plt.scatter(samples_x_enc, samples_y_enc, s=2)
-    plt.title('Encrypted Image', fontsize=20)
-    plt.xlabel('Pixel Value', fontsize=16)
-    plt.ylabel('Adjacent Pixel Value', fontsize=16)
 
-    plt.tight_layout()
-    plt.show()
\ No newline at end of file
+# ---------------------------------------------------------------------------
+# 数值指标：均为 numpy 向量化实现，返回数值（多通道图像按通道给出），可用于大批量图像的检查
+# ---------------------------------------------------------------------------
+
+# 自由度为 255 的卡方分布在显著性水平 0.05 下的临界值，均匀分布的直方图其统计量应低于该值
+CHI_SQUARE_CRITICAL_005 = 293.2478
+
+ADJACENT_DIRECTIONS = ('horizontal', 'vertical', 'diagonal')
+
+
+def _channels(img):
+    """将图像转换为 (像素数, 通道数) 的二维数组，灰度图视为单通道"""
+    img = np.asarray(img)
+    return img.reshape(-1, 1) if img.ndim == 2 else img.reshape(-1, img.shape[2])
+
+
+def to_gray(img):
+    """BGR 彩色图像转换为灰度图（ITU-R 601-2 亮度公式），灰度图原样返回"""
+    img = np.asarray(img)
+    if img.ndim == 2:
+        return img
+    gray = img[..., 0] * 0.114 + img[..., 1] * 0.587 + img[..., 2] * 0.299
+    return np.rint(gray).astype(np.uint8)
+
+
+def histogram(img):
+    """每个通道的灰度直方图，返回 (通道数, 256) 的数组"""
+    pixels = _channels(img)
+    channels = pixels.shape[1]
+    # 各通道的像素值错开 256，一次 bincount 得到所有通道的直方图
+    offset = pixels.astype(np.intp) + np.arange(channels) * 256
+    return np.bincount(offset.ravel(), minlength=256 * channels).reshape(channels, 256)
+
+
+def entropy(img):
+    """每个通道的香农信息熵（单位 bit），理想的加密图像接近 8"""
+    hist = histogram(img)
+    prob = hist / hist.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.sum(np.where(prob > 0, prob * np.log2(1 / prob), 0.0), axis=1)
+
+
+def chi_square(img):
+    """每个通道直方图相对均匀分布的卡方统计量，小于 CHI_SQUARE_CRITICAL_005 时可认为分布均匀"""
+    hist = histogram(img)
+    expected = hist.sum(axis=1, keepdims=True) / 256
+    return np.sum((hist - expected) ** 2 / expected, axis=1)
+
+
+def adjacent_pixel_pairs(img, direction='horizontal'):
+    """返回所有相邻像素对 (x, y)，多通道图像的形状为 (像素对数, 通道数)
+
+    direction: 'horizontal' 右侧相邻，'vertical' 下方相邻，'diagonal' 右下方相邻
+    """
+    img = np.asarray(img)
+    if direction == 'horizontal':
+        x, y = img[:, :-1], img[:, 1:]
+    elif direction == 'vertical':
+        x, y = img[:-1, :], img[1:, :]
+    elif direction == 'diagonal':
+        x, y = img[:-1, :-1], img[1:, 1:]
+    else:
+        raise ValueError(f"不支持的方向: {direction}，可选: {ADJACENT_DIRECTIONS}")
+    if img.ndim == 2:
+        return x.ravel(), y.ravel()
+    return _channels(x), _channels(y)
+
+
+def correlation(img, direction='horizontal'):
+    """全部相邻像素对的相关系数（Pearson），按通道给出；理想的加密图像接近 0，像素值为常数时为 nan"""
+    x, y = adjacent_pixel_pairs(img, direction)
+    x = x.reshape(len(x), -1).astype(np.float64)
+    y = y.reshape(len(y), -1).astype(np.float64)
+    x -= x.mean(axis=0)
+    y -= y.mean(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.einsum('ij,ij->j', x, y) / np.sqrt(np.einsum('ij,ij->j', x, x) * np.einsum('ij,ij->j', y, y))
+
+
+def npcr_uaci(cipher1, cipher2):
+    """两幅密文图像的 NPCR 与 UACI（百分比），按通道给出
+
+    通常用于差分攻击分析：cipher1、cipher2 为仅相差一个像素的两幅明文分别加密的结果，
+    理想值约为 NPCR 99.61%、UACI 33.46%。
+    Returns: (npcr, uaci)
+    """
+    c1, c2 = _channels(cipher1), _channels(cipher2)
+    assert c1.shape == c2.shape, f"两幅密文图像的尺寸不一致: {np.shape(cipher1)} != {np.shape(cipher2)}"
+    diff = np.abs(c1.astype(np.int16) - c2.astype(np.int16))
+    npcr = np.count_nonzero(diff, axis=0) / len(diff) * 100
+    uaci = diff.mean(axis=0) / 255 * 100
+    return npcr, uaci
+
+
+def image_metrics(img):
+    """单幅（加密）图像的全部统计指标，便于批量记录
+
+    Returns: {'entropy', 'chi_square', 'correlation_horizontal', 'correlation_vertical',
+              'correlation_diagonal'}，每项为按通道的数组
+    """
+    metrics = {'entropy': entropy(img), 'chi_square': chi_square(img)}
+    for direction in ADJACENT_DIRECTIONS:
+        metrics[f'correlation_{direction}'] = correlation(img, direction)
+    return metrics
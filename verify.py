@@ -0,0 +1,253 @@
+"""加解密正确性验证：往返测试与差分测试
+
+- 往返测试：对随机生成的图像（灰度 / BGR、奇数尺寸、1×N 等边界情况）检查 decrypt(encrypt(x)) == x；
+- 差分测试：各算法的加速实现（numpy 引擎、python / numba 后端、闭式猫映射等）与参考实现逐字节比较；
+- 接口一致性：encrypt_many / encrypt_tiled 等批处理接口、视频流的逐帧处理、prepare 得到的计划与逐张处理的结果一致。
+
+用法：
+    python verify.py                           # 快速模式，适合 CI
+    python verify.py --long                    # 长时间的随机测试，覆盖更多尺寸与密钥
+    python verify.py --seed 123 --iterations 1 # 按失败信息中给出的种子复现单个用例
+"""
+import argparse
+import string
+import sys
+import time
+
+import numpy as np
+
+from algorithms import ArnoldCatCrypto, LogisticCrypto, LogisticKeyMixingCrypto, RSACrypto
+from algorithms import KeyMixingKernel
+from algorithms.BaseCrypto import BaseCrypto
+
+# 必测的边界尺寸 (高, 宽)，之后为随机尺寸
+EDGE_SHAPES = [(1, 1), (1, 7), (7, 1), (2, 3), (5, 17), (17, 5), (16, 16), (31, 33)]
+
+
+def random_image(rng, shape, channels):
+    return rng.integers(0, 256, shape if channels == 1 else shape + (channels,), dtype=np.uint8)
+
+
+def random_shape(rng, seed, max_size):
+    """种子为 0 ~ len(EDGE_SHAPES) - 1 的用例使用边界尺寸，其余为随机尺寸"""
+    if 0 <= seed < len(EDGE_SHAPES):
+        return EDGE_SHAPES[seed]
+    return int(rng.integers(1, max_size + 1)), int(rng.integers(1, max_size + 1))
+
+
+def arnold_key(rng):
+    return int(rng.integers(1, 50)), int(rng.integers(1, 50)), int(rng.integers(1, 30))
+
+
+def logistic_key(rng):
+    return float(rng.uniform(3.57, 4.0)), float(rng.uniform(0.01, 0.99)), int(rng.integers(1, 4))
+
+
+def key_mixing_key(rng):
+    length = int(rng.integers(1, 21))
+    return ''.join(rng.choice(list(string.ascii_letters + string.digits + string.punctuation), length))
+
+
+def arnold_reference(img, a, b, num_iter, reverse=False):
+    """原始的逐次迭代猫映射（补零为方形），作为 ArnoldCatCrypto 闭式实现的参考"""
+    h, w = img.shape[:2]
+    N = max(h, w)
+    result = np.zeros((N, N) + img.shape[2:], dtype=img.dtype)
+    result[:h, :w] = img
+    x, y = np.meshgrid(np.arange(N), np.arange(N))
+    if not reverse:
+        new_x, new_y = (x + b * y) % N, (a * x + (a * b + 1) * y) % N
+    else:
+        new_x, new_y = ((a * b + 1) * x - b * y) % N, (-a * x + y) % N
+    for _ in range(num_iter):
+        result = result[new_y, new_x]
+    return result
+
+
+class Verifier:
+    """按名称统计每项检查的通过 / 失败次数，失败时记录复现所需的信息"""
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.passed = {}
+        self.failures = []
+
+    def check(self, name, condition, detail):
+        self.passed.setdefault(name, 0)
+        if condition:
+            self.passed[name] += 1
+        else:
+            self.failures.append(f"{name}: {detail}")
+            if self.verbose:
+                print(f"FAIL {name}: {detail}", flush=True)
+
+    def equal(self, name, actual, expected, detail):
+        actual, expected = np.asarray(actual), np.asarray(expected)
+        same = actual.shape == expected.shape and np.array_equal(actual, expected)
+        if not same and actual.shape == expected.shape:
+            detail += f", {np.count_nonzero(actual != expected)} 个字节不同"
+        elif not same:
+            detail += f", 形状 {actual.shape} != {expected.shape}"
+        self.check(name, same, detail)
+
+
+def check_case(verifier, rng, shape, channels, detail, rsa_keys, backends, workers):
+    """对一幅随机图像执行全部检查"""
+    img = random_image(rng, shape, channels)
+
+    # ArnoldCat：闭式 M^n 实现与逐次迭代的参考实现、正向解密、矩形模式
+    key = arnold_key(rng)
+    info = f"{detail}, key={key}"
+    arnold = ArnoldCatCrypto(key)
+    encrypted = arnold.encrypt(img)
+    verifier.equal("arnold/pad/differential", encrypted, arnold_reference(img, *key), info)
+    verifier.equal("arnold/pad/roundtrip", arnold.decrypt(encrypted, key, shape=img.shape), img, info)
+    verifier.equal("arnold/forward_decrypt/differential", ArnoldCatCrypto(key, forward_decrypt=True).decrypt(
+        encrypted, key), arnold.decrypt(encrypted, key), info)
+    native = ArnoldCatCrypto(key, mode='native')
+    encrypted_native = native.encrypt(img)
+    verifier.equal("arnold/native/roundtrip", native.decrypt(encrypted_native, key), img, info)
+    if shape[0] == shape[1]:
+        verifier.equal("arnold/native/differential", encrypted_native, encrypted, info)
+
+    # Logistic：numpy 引擎与参考实现
+    key = logistic_key(rng)
+    info = f"{detail}, key={key}"
+    logistic = LogisticCrypto(key)
+    reference = LogisticCrypto(key, engine='reference')
+    encrypted = logistic.encrypt(img)
+    verifier.equal("logistic/numpy/roundtrip", logistic.decrypt(encrypted, key), img, info)
+    verifier.equal("logistic/numpy/differential/encrypt", encrypted, reference.encrypt(img), info)
+    verifier.equal("logistic/numpy/differential/decrypt", logistic.decrypt(encrypted, key),
+                   reference.decrypt(encrypted, key), info)
+
+    # Logistic KM：各内层循环后端与参考实现
+    key = key_mixing_key(rng)
+    info = f"{detail}, key={key!r}"
+    reference = LogisticKeyMixingCrypto(key, backend='reference')
+    expected = reference.encrypt(img)
+    verifier.equal("key_mixing/reference/roundtrip", reference.decrypt(expected, key), img, info)
+    for backend in backends:
+        crypto = LogisticKeyMixingCrypto(key, backend=backend)
+        encrypted = crypto.encrypt(img)
+        verifier.equal(f"key_mixing/{backend}/differential/encrypt", encrypted, expected, info)
+        verifier.equal(f"key_mixing/{backend}/differential/decrypt", crypto.decrypt(encrypted, key),
+                       reference.decrypt(encrypted, key), info)
+        verifier.equal(f"key_mixing/{backend}/roundtrip", crypto.decrypt(encrypted, key), img, info)
+
+    # RSA：逐块模式（含流式接口）与混合模式；密文带随机填充，只做往返测试
+    public_key, private_key = rsa_keys
+    for mode in ('block', 'hybrid'):
+        rsa = RSACrypto(public_key, mode=mode)
+        verifier.equal(f"rsa/{mode}/roundtrip", rsa.decrypt(rsa.encrypt(img), private_key), img, detail)
+    rsa = RSACrypto(public_key)
+    chunks = list(rsa.decrypt_stream(rsa.encrypt_stream([img.tobytes()], img.shape), private_key))
+    verifier.equal("rsa/stream/roundtrip", np.frombuffer(b''.join(chunks[1:]), dtype=np.uint8).reshape(img.shape),
+                   img, detail)
+
+    # 批处理与分块接口：与逐张处理一致、往返正确
+    crypto = LogisticCrypto(logistic_key(rng))
+    batch = list(crypto.encrypt_many([img, img[::-1].copy()], workers=workers))
+    verifier.equal("batch/encrypt_many", batch[0], crypto.encrypt(img), detail)
+    verifier.equal("batch/decrypt_many", list(crypto.decrypt_many(batch, crypto.key, workers=workers))[1],
+                   img[::-1], detail)
+    tile_size = (int(rng.integers(1, shape[0] + 1)), int(rng.integers(1, shape[1] + 1)))
+    for crypto in (ArnoldCatCrypto(arnold_key(rng)), crypto, LogisticKeyMixingCrypto(key_mixing_key(rng))):
+        tiled = crypto.encrypt_tiled(img, tile_size, workers=workers)
+        verifier.equal(f"tiled/{type(crypto).__name__}/roundtrip",
+                       crypto.decrypt_tiled(tiled, crypto.key, workers=workers), img,
+                       f"{detail}, tile_size={tile_size}")
+
+    # 视频流：逐帧处理函数与 encrypt / decrypt 一致，带帧掩码的往返正确
+    for crypto in (ArnoldCatCrypto(arnold_key(rng)), ArnoldCatCrypto(arnold_key(rng), mode='native'),
+                   LogisticCrypto(logistic_key(rng)), LogisticKeyMixingCrypto(key_mixing_key(rng))):
+        name, key = type(crypto).__name__, crypto.key
+        info = f"{detail}, key={key!r}"
+        encrypted = crypto.encrypt(img)
+        verifier.equal(f"frames/{name}/differential/encrypt",
+                       crypto._frame_processor(key, img.shape, False)(img.copy()), encrypted, info)
+        verifier.equal(f"frames/{name}/differential/decrypt",
+                       crypto._frame_processor(key, img.shape, True)(encrypted), img, info)
+        frames = [img, img, img[::-1].copy()]
+        stream = crypto.encrypt_frames(frames, workers=workers)
+        encrypted = list(stream)
+        decrypted = list(crypto.decrypt_frames(encrypted, key, stream.nonce, img.shape, workers=workers))
+        verifier.equal(f"frames/{name}/roundtrip", np.stack(decrypted), np.stack(frames), info)
+
+    # 计划（prepare）：写入 out 的结果与 encrypt / decrypt 一致，同一组输出数组可反复使用
+    for crypto, key in ((ArnoldCatCrypto(arnold_key(rng)), None),
+                        (ArnoldCatCrypto(arnold_key(rng), mode='native'), None),
+                        (LogisticCrypto(logistic_key(rng)), None),
+                        (LogisticKeyMixingCrypto(key_mixing_key(rng)), None),
+                        (RSACrypto(public_key), private_key),
+                        (RSACrypto(public_key, mode='hybrid'), private_key)):
+        name = type(crypto).__name__
+        info = f"{detail}, key={crypto.key!r}"
+        plan = crypto.prepare(img.shape, key=key)
+        encrypted = np.empty(plan.cipher_shape, dtype=np.uint8)
+        decrypted = np.empty(img.shape, dtype=np.uint8)
+        for _ in range(2):
+            plan.encrypt(img, out=encrypted)
+            plan.decrypt(encrypted, out=decrypted)
+        verifier.equal(f"plan/{name}/roundtrip", decrypted, img, info)
+        if key is None:
+            verifier.equal(f"plan/{name}/differential/encrypt", encrypted, crypto.encrypt(img), info)
+        else:
+            # RSA 密文带随机填充，只检查与 decrypt 的格式兼容
+            verifier.equal(f"plan/{name}/{crypto.mode}/decrypt", crypto.decrypt(encrypted, key), img, info)
+
+    # ArnoldCat 的计划支持任意 dtype：非方形图像在 'pad' 模式下以整个像素（多字节）为单位散射
+    for dtype in (np.uint16, np.float32):
+        wide = img.astype(dtype) * 257
+        for mode in ('pad', 'native'):
+            crypto = ArnoldCatCrypto(arnold_key(rng), mode=mode)
+            info = f"{detail}, dtype={np.dtype(dtype).name}, mode={mode}, key={crypto.key!r}"
+            plan = crypto.prepare(wide.shape, dtype)
+            encrypted = plan.encrypt(wide)
+            verifier.equal(f"plan/ArnoldCatCrypto/{np.dtype(dtype).name}/roundtrip", plan.decrypt(encrypted),
+                           wide, info)
+            verifier.equal(f"plan/ArnoldCatCrypto/{np.dtype(dtype).name}/differential/encrypt", encrypted,
+                           crypto.encrypt(wide), info)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="图像加密算法的往返测试与差分测试")
+    parser.add_argument("--long", action="store_true", help="长时间随机测试（默认 300 个用例，尺寸最大 96）")
+    parser.add_argument("--iterations", type=int, default=None, help="随机用例数")
+    parser.add_argument("--max-size", type=int, default=None, help="随机图像的最大边长")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="第一个用例的种子，第 i 个用例的种子为 seed + i；用例完全由种子决定")
+    parser.add_argument("--workers", type=int, default=1, help="批处理与分块接口使用的进程数")
+    parser.add_argument("--verbose", action="store_true", help="立即打印每个失败")
+    args = parser.parse_args(argv)
+
+    iterations = args.iterations or (300 if args.long else len(EDGE_SHAPES) * 2)
+    max_size = args.max_size or (96 if args.long else 33)
+
+    BaseCrypto.progress = False
+    BaseCrypto.instrument = None
+    backends = [name for name in ('python', 'numba') if name in KeyMixingKernel.BACKENDS]
+    rsa_keys = RSACrypto.generate_keypair(1024)
+    verifier = Verifier(args.verbose)
+
+    time_start = time.perf_counter()
+    for index in range(iterations):
+        seed = args.seed + index
+        rng = np.random.default_rng(seed)
+        shape = random_shape(rng, seed, max_size)
+        channels = 1 if seed % 2 == 0 else 3
+        detail = f"seed={seed}, shape={shape}, channels={channels}"
+        check_case(verifier, rng, shape, channels, detail, rsa_keys, backends, args.workers)
+
+    elapsed = time.perf_counter() - time_start
+    for name, count in sorted(verifier.passed.items()):
+        failed = sum(failure.startswith(name + ":") for failure in verifier.failures)
+        print(f"{'FAIL' if failed else 'ok  '} {name:<52} {count} passed, {failed} failed")
+    for failure in verifier.failures:
+        print(f"FAIL {failure}")
+    print(f"{iterations} cases in {elapsed:.1f}s, {len(verifier.failures)} failures")
+    return 1 if verifier.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())